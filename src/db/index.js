@@ -13,6 +13,8 @@ const pool = new Pool({
   connectionTimeoutMillis: 2000,
 });
 
+const LOG_SLOW_QUERIES = process.env.NODE_ENV === 'development';
+
 // Log connection events
 pool.on('connect', () => {
   console.log('📊 New database connection established');
@@ -30,7 +32,7 @@ const query = async (text, params) => {
     const duration = Date.now() - start;
     
     // Log slow queries in development
-    if (process.env.NODE_ENV === 'development' && duration > 100) {
+    if (LOG_SLOW_QUERIES && duration > 100) {
       console.log(`🐢 Slow query (${duration}ms):`, text.substring(0, 50));
     }
     
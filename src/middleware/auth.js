@@ -5,6 +5,10 @@
 const jwt = require('jsonwebtoken');
 const { query } = require('../db');
 
+const JWT_SECRET = process.env.JWT_SECRET;
+const JWT_EXPIRES_IN = process.env.JWT_EXPIRES_IN || '7d';
+const BEARER_PREFIX = 'Bearer ';
+
 /**
  * Verify JWT token and attach user to request
  */
@@ -13,19 +17,19 @@ const authenticate = async (req, res, next) => {
     // Get token from header
     const authHeader = req.headers.authorization;
     
-    if (!authHeader || !authHeader.startsWith('Bearer ')) {
+    if (!authHeader || !authHeader.startsWith(BEARER_PREFIX)) {
       return res.status(401).json({
         success: false,
         error: 'Authentication required. Please log in.'
       });
     }
     
-    const token = authHeader.split(' ')[1];
+    const token = authHeader.slice(BEARER_PREFIX.length);
     
     // Verify token
     let decoded;
     try {
-      decoded = jwt.verify(token, process.env.JWT_SECRET);
+      decoded = jwt.verify(token, JWT_SECRET);
     } catch (err) {
       if (err.name === 'TokenExpiredError') {
         return res.status(401).json({
@@ -72,15 +76,15 @@ const optionalAuth = async (req, res, next) => {
   try {
     const authHeader = req.headers.authorization;
     
-    if (!authHeader || !authHeader.startsWith('Bearer ')) {
+    if (!authHeader || !authHeader.startsWith(BEARER_PREFIX)) {
       req.user = null;
       return next();
     }
     
-    const token = authHeader.split(' ')[1];
+    const token = authHeader.slice(BEARER_PREFIX.length);
     
     try {
-      const decoded = jwt.verify(token, process.env.JWT_SECRET);
+      const decoded = jwt.verify(token, JWT_SECRET);
       const result = await query(
         'SELECT id, email, full_name, subscription_status, subscription_type, analyses_today FROM users WHERE id = $1',
         [decoded.userId]
@@ -153,8 +157,8 @@ function getNextMidnight() {
 const generateToken = (userId) => {
   return jwt.sign(
     { userId },
-    process.env.JWT_SECRET,
-    { expiresIn: process.env.JWT_EXPIRES_IN || '7d' }
+    JWT_SECRET,
+    { expiresIn: JWT_EXPIRES_IN }
   );
 };
 
@@ -20,11 +20,8 @@ const storage = multer.diskStorage({
     const userId = req.user?.id || 'anonymous';
     const userDir = path.join(uploadsDir, userId.toString());
     
-    if (!fs.existsSync(userDir)) {
-      fs.mkdirSync(userDir, { recursive: true });
-    }
-    
-    cb(null, userDir);
+    // recursive mkdir is a no-op when the folder already exists
+    fs.mkdir(userDir, { recursive: true }, (err) => cb(err, userDir));
   },
   filename: (req, file, cb) => {
     // Generate unique filename: timestamp-originalname
@@ -38,19 +35,18 @@ const storage = multer.diskStorage({
   }
 });
 
+const ALLOWED_TYPES = new Set([
+  'application/pdf',
+  'application/msword',
+  'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
+  'text/plain'
+]);
+
+const ALLOWED_EXTENSIONS = new Set(['.pdf', '.doc', '.docx', '.txt']);
+
 // File filter - only allow specific file types
 const fileFilter = (req, file, cb) => {
-  const allowedTypes = [
-    'application/pdf',
-    'application/msword',
-    'application/vnd.openxmlformats-officedocument.wordprocessingml.document',
-    'text/plain'
-  ];
-  
-  const allowedExtensions = ['.pdf', '.doc', '.docx', '.txt'];
-  const ext = path.extname(file.originalname).toLowerCase();
-  
-  if (allowedTypes.includes(file.mimetype) || allowedExtensions.includes(ext)) {
+  if (ALLOWED_TYPES.has(file.mimetype) || ALLOWED_EXTENSIONS.has(path.extname(file.originalname).toLowerCase())) {
     cb(null, true);
   } else {
     cb(new Error('Invalid file type. Only PDF, DOC, DOCX, and TXT files are allowed.'), false);
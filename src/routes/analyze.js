@@ -1,103 +1,154 @@
 /**
  * AI Analysis Routes
  * POST /api/analyze - Analyze job-resume match
+ * POST /api/analyze/stream - Analyze job-resume match (SSE, score first)
  * POST /api/analyze/tailor - Generate tailored resume
  * POST /api/analyze/cover-letter - Generate cover letter
+ * POST /api/analyze/cover-letter/stream - Stream cover letter (SSE)
  * GET /api/analyze/history - Get analysis history
  */
 
 const express = require('express');
 const { query } = require('../db');
 const { authenticate, optionalAuth, checkUsageLimit } = require('../middleware/auth');
-const { analyzeMatch, generateTailoredResume, generateCoverLetter } = require('../services/ai');
+const {
+  analyzeMatch,
+  analyzeMatchWithCoverLetter,
+  scoreMatch,
+  generateTailoredResume,
+  generateCoverLetter,
+  streamCoverLetter
+} = require('../services/ai');
+const { isText } = require('../utils/validation');
 
 const router = express.Router();
 
+// Placeholder titles/companies the frontend sends when it couldn't extract real ones
+const GENERIC_VALUES = new Set(['job posting', 'unknown company', 'untitled', 'untitled job', 'n/a', 'unknown']);
+
+function isGenericValue(val) {
+  return !val || GENERIC_VALUES.has(val.toLowerCase().trim());
+}
+
+/**
+ * Bump the user's daily and total analysis counters.
+ * Routes call this after their own save succeeds, without awaiting, so the
+ * write stays off the response path and failed saves aren't charged.
+ */
+function recordUsage(userId) {
+  const today = new Date().toISOString().split('T')[0];
+  return query(
+    `UPDATE users SET 
+      analyses_today = CASE 
+        WHEN last_analysis_date = $1 THEN analyses_today + 1
+        ELSE 1
+      END,
+      analyses_total = analyses_total + 1,
+      last_analysis_date = $1
+     WHERE id = $2`,
+    [today, userId]
+  ).catch(err => console.error('Usage tracking error:', err));
+}
+
+/**
+ * Run a match analysis for the request body, save it and return the response payload
+ * Shared by the JSON and streaming analyze routes
+ */
+async function runAnalysis(req, { onScore } = {}) {
+  const {
+    jobDescription, resumeText, jobTitle, companyName, jobUrl, jobLocation,
+    includeCoverLetter, tone
+  } = req.body;
+  
+  // Call AI service - one combined call when the cover letter is wanted too
+  let analysisResult;
+  let coverLetter = null;
+  if (includeCoverLetter) {
+    ({ analysis: analysisResult, coverLetter } = await analyzeMatchWithCoverLetter(
+      jobDescription,
+      resumeText,
+      companyName,
+      tone || 'professional',
+      { onScore }
+    ));
+  } else {
+    analysisResult = await analyzeMatch(jobDescription, resumeText, { onScore });
+  }
+  
+  // Use AI-extracted values if frontend sent generic placeholders
+  const finalJobTitle = isGenericValue(jobTitle) 
+    ? (analysisResult.jobTitle || 'Job Position') 
+    : jobTitle;
+  const finalCompanyName = isGenericValue(companyName) 
+    ? (analysisResult.companyName || 'Company') 
+    : companyName;
+  
+  // Save analysis
+  const saveResult = await query(
+    `INSERT INTO analyses 
+      (user_id, job_title, company_name, job_url, job_description, job_location,
+       match_score, ats_score, analysis_result, matching_skills, missing_skills, cover_letter)
+     VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12)
+     RETURNING id`,
+    [
+      req.user.id,
+      finalJobTitle,
+      finalCompanyName,
+      jobUrl,
+      jobDescription,
+      jobLocation,
+      analysisResult.overall_match_score,
+      analysisResult.ats_optimization?.estimated_ats_score || Math.round(analysisResult.overall_match_score * 0.8),
+      JSON.stringify(analysisResult),
+      analysisResult.skills_analysis?.matching_skills || [],
+      analysisResult.skills_analysis?.missing_skills || [],
+      coverLetter
+    ]
+  );
+  
+  // Only charge the quota once the result is safely stored
+  recordUsage(req.user.id);
+  
+  // Add extracted title/company to the result for the extension to use
+  analysisResult.extractedJobTitle = finalJobTitle;
+  analysisResult.extractedCompanyName = finalCompanyName;
+  
+  return {
+    analysisId: saveResult.rows[0].id,
+    result: analysisResult,
+    ...(includeCoverLetter && { coverLetter }),
+    usage: {
+      used: req.usageInfo.used + 1,
+      remaining: req.usageInfo.remaining - 1,
+      limit: req.usageInfo.limit
+    }
+  };
+}
+
 /**
  * Analyze job-resume match
  * POST /api/analyze
+ *
+ * Pass includeCoverLetter (and optionally tone) to get a cover letter
+ * generated in the same AI call.
  */
 router.post('/', authenticate, checkUsageLimit, async (req, res) => {
   try {
-    const { jobDescription, resumeText, jobTitle, companyName, jobUrl, jobLocation } = req.body;
+    const { jobDescription, resumeText } = req.body;
     
     // Validation
-    if (!jobDescription || !resumeText) {
+    if (!isText(jobDescription) || !isText(resumeText)) {
       return res.status(400).json({
         success: false,
         error: 'Job description and resume text are required.'
       });
     }
     
-    // Call AI service
-    const analysisResult = await analyzeMatch(jobDescription, resumeText);
-    
-    // Helper to check if a value is a generic placeholder
-    const isGenericValue = (val) => {
-      if (!val) return true;
-      const generic = ['job posting', 'unknown company', 'untitled', 'untitled job', 'n/a', 'unknown'];
-      return generic.includes(val.toLowerCase().trim());
-    };
-    
-    // Use AI-extracted values if frontend sent generic placeholders
-    const finalJobTitle = isGenericValue(jobTitle) 
-      ? (analysisResult.jobTitle || 'Job Position') 
-      : jobTitle;
-    const finalCompanyName = isGenericValue(companyName) 
-      ? (analysisResult.companyName || 'Company') 
-      : companyName;
-    
-    // Save analysis to database
-    const saveResult = await query(
-      `INSERT INTO analyses 
-        (user_id, job_title, company_name, job_url, job_description, job_location,
-         match_score, ats_score, analysis_result, matching_skills, missing_skills)
-       VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11)
-       RETURNING id`,
-      [
-        req.user.id,
-        finalJobTitle,
-        finalCompanyName,
-        jobUrl,
-        jobDescription,
-        jobLocation,
-        analysisResult.overall_match_score,
-        analysisResult.ats_optimization?.estimated_ats_score || Math.round(analysisResult.overall_match_score * 0.8),
-        JSON.stringify(analysisResult),
-        analysisResult.skills_analysis?.matching_skills || [],
-        analysisResult.skills_analysis?.missing_skills || []
-      ]
-    );
-    
-    // Add extracted title/company to the result for the extension to use
-    analysisResult.extractedJobTitle = finalJobTitle;
-    analysisResult.extractedCompanyName = finalCompanyName;
-    
-    // Update usage count
-    const today = new Date().toISOString().split('T')[0];
-    await query(
-      `UPDATE users SET 
-        analyses_today = CASE 
-          WHEN last_analysis_date = $1 THEN analyses_today + 1
-          ELSE 1
-        END,
-        analyses_total = analyses_total + 1,
-        last_analysis_date = $1
-       WHERE id = $2`,
-      [today, req.user.id]
-    );
+    const data = await runAnalysis(req);
     
     res.json({
       success: true,
-      data: {
-        analysisId: saveResult.rows[0].id,
-        result: analysisResult,
-        usage: {
-          used: req.usageInfo.used + 1,
-          remaining: req.usageInfo.remaining - 1,
-          limit: req.usageInfo.limit
-        }
-      }
+      data
     });
     
   } catch (error) {
@@ -109,21 +160,77 @@ router.post('/', authenticate, checkUsageLimit, async (req, res) => {
   }
 });
 
+/**
+ * Analyze job-resume match, streaming progress
+ * POST /api/analyze/stream
+ *
+ * Server-sent events: an `event: score` frame with { score } as soon as the
+ * overall match score has been generated, then `event: done` with the same
+ * data POST /api/analyze returns.
+ */
+router.post('/stream', authenticate, checkUsageLimit, async (req, res) => {
+  const { jobDescription, resumeText } = req.body;
+  
+  if (!isText(jobDescription) || !isText(resumeText)) {
+    return res.status(400).json({
+      success: false,
+      error: 'Job description and resume text are required.'
+    });
+  }
+  
+  res.setHeader('Content-Type', 'text/event-stream');
+  res.setHeader('Cache-Control', 'no-cache');
+  res.setHeader('Connection', 'keep-alive');
+  res.flushHeaders();
+  
+  let clientGone = false;
+  res.on('close', () => { clientGone = true; });
+  
+  try {
+    const data = await runAnalysis(req, {
+      onScore: (score) => {
+        if (!clientGone) res.write(`event: score\ndata: ${JSON.stringify({ score })}\n\n`);
+      }
+    });
+    
+    if (clientGone) return;
+    res.write(`event: done\ndata: ${JSON.stringify(data)}\n\n`);
+    res.end();
+    
+  } catch (error) {
+    console.error('Analysis stream error:', error);
+    if (!clientGone) {
+      res.write(`event: error\ndata: ${JSON.stringify({ error: 'Analysis failed. Please try again.' })}\n\n`);
+      res.end();
+    }
+  }
+});
+
 /**
  * Generate tailored resume
  * POST /api/analyze/tailor
+ *
+ * Pass rescore: false to skip re-analyzing the tailored resume when the
+ * caller doesn't need the improved scores (saves an AI call).
  */
 router.post('/tailor', authenticate, checkUsageLimit, async (req, res) => {
   try {
-    const { analysisId, jobDescription, resumeText, selectedSkills, quickWins } = req.body;
+    const { analysisId, jobDescription, resumeText, selectedSkills, quickWins, rescore = true } = req.body;
     
-    if (!jobDescription || !resumeText) {
+    if (!isText(jobDescription) || !isText(resumeText)) {
       return res.status(400).json({
         success: false,
         error: 'Job description and resume text are required.'
       });
     }
     
+    if (selectedSkills && !Array.isArray(selectedSkills)) {
+      return res.status(400).json({
+        success: false,
+        error: 'Selected skills must be a list.'
+      });
+    }
+    
     // Generate tailored resume
     const tailoredResume = await generateTailoredResume(
       jobDescription,
@@ -132,40 +239,31 @@ router.post('/tailor', authenticate, checkUsageLimit, async (req, res) => {
       quickWins || []
     );
     
-    // Re-analyze the tailored resume
-    const improvedAnalysis = await analyzeMatch(jobDescription, tailoredResume.resumeText);
+    // Re-score the tailored resume (scores only - the full analysis isn't returned)
+    const improvedScores = rescore
+      ? await scoreMatch(jobDescription, tailoredResume.resumeText)
+      : null;
     
-    // Update analysis record if analysisId provided
+    // Update analysis record (if analysisId provided)
     if (analysisId) {
       await query(
         `UPDATE analyses SET 
           tailored_resume_text = $1,
           tailored_resume_score = $2
          WHERE id = $3 AND user_id = $4`,
-        [tailoredResume.resumeText, improvedAnalysis.overall_match_score, analysisId, req.user.id]
+        [tailoredResume.resumeText, improvedScores?.overall_match_score ?? null, analysisId, req.user.id]
       );
     }
     
-    // Update usage count
-    const today = new Date().toISOString().split('T')[0];
-    await query(
-      `UPDATE users SET 
-        analyses_today = CASE 
-          WHEN last_analysis_date = $1 THEN analyses_today + 1
-          ELSE 1
-        END,
-        analyses_total = analyses_total + 1,
-        last_analysis_date = $1
-       WHERE id = $2`,
-      [today, req.user.id]
-    );
+    // Only charge the quota once the result is safely stored
+    recordUsage(req.user.id);
     
     res.json({
       success: true,
       data: {
         tailoredResume: tailoredResume.resumeText,
-        improvedScore: improvedAnalysis.overall_match_score,
-        improvedAtsScore: improvedAnalysis.ats_optimization?.estimated_ats_score,
+        improvedScore: improvedScores?.overall_match_score ?? null,
+        improvedAtsScore: improvedScores?.estimated_ats_score ?? null,
         changes: tailoredResume.changes
       }
     });
@@ -187,7 +285,7 @@ router.post('/cover-letter', authenticate, checkUsageLimit, async (req, res) =>
   try {
     const { analysisId, jobDescription, resumeText, companyName, tone } = req.body;
     
-    if (!jobDescription || !resumeText) {
+    if (!isText(jobDescription) || !isText(resumeText)) {
       return res.status(400).json({
         success: false,
         error: 'Job description and resume text are required.'
@@ -226,6 +324,61 @@ router.post('/cover-letter', authenticate, checkUsageLimit, async (req, res) =>
   }
 });
 
+/**
+ * Stream cover letter as it is generated
+ * POST /api/analyze/cover-letter/stream
+ *
+ * Server-sent events: each `data:` frame carries { text } with the next chunk,
+ * followed by a final `event: done` frame with the full letter.
+ */
+router.post('/cover-letter/stream', authenticate, checkUsageLimit, async (req, res) => {
+  const { analysisId, jobDescription, resumeText, companyName, tone } = req.body;
+  
+  if (!isText(jobDescription) || !isText(resumeText)) {
+    return res.status(400).json({
+      success: false,
+      error: 'Job description and resume text are required.'
+    });
+  }
+  
+  res.setHeader('Content-Type', 'text/event-stream');
+  res.setHeader('Cache-Control', 'no-cache');
+  res.setHeader('Connection', 'keep-alive');
+  res.flushHeaders();
+  
+  let clientGone = false;
+  res.on('close', () => { clientGone = true; });
+  
+  try {
+    let coverLetter = '';
+    
+    for await (const text of streamCoverLetter(jobDescription, resumeText, companyName, tone || 'professional')) {
+      // Stop pulling tokens once the client disconnects
+      if (clientGone) return;
+      coverLetter += text;
+      res.write(`data: ${JSON.stringify({ text })}\n\n`);
+    }
+    
+    // Update analysis record if analysisId provided
+    if (analysisId) {
+      await query(
+        `UPDATE analyses SET cover_letter = $1 WHERE id = $2 AND user_id = $3`,
+        [coverLetter, analysisId, req.user.id]
+      );
+    }
+    
+    res.write(`event: done\ndata: ${JSON.stringify({ coverLetter })}\n\n`);
+    res.end();
+    
+  } catch (error) {
+    console.error('Cover letter stream error:', error);
+    if (!clientGone) {
+      res.write(`event: error\ndata: ${JSON.stringify({ error: 'Failed to generate cover letter.' })}\n\n`);
+      res.end();
+    }
+  }
+});
+
 /**
  * Get analysis history
  * GET /api/analyze/history
@@ -234,23 +387,24 @@ router.get('/history', authenticate, async (req, res) => {
   try {
     const { limit = 20, offset = 0 } = req.query;
     
-    const result = await query(
-      `SELECT id, job_title, company_name, job_url, job_location,
-              match_score, ats_score, matching_skills, missing_skills,
-              tailored_resume_score, cover_letter IS NOT NULL as has_cover_letter,
-              created_at
-       FROM analyses 
-       WHERE user_id = $1
-       ORDER BY created_at DESC
-       LIMIT $2 OFFSET $3`,
-      [req.user.id, parseInt(limit), parseInt(offset)]
-    );
-    
-    // Get total count
-    const countResult = await query(
-      'SELECT COUNT(*) as total FROM analyses WHERE user_id = $1',
-      [req.user.id]
-    );
+    // Fetch the page and the total count concurrently
+    const [result, countResult] = await Promise.all([
+      query(
+        `SELECT id, job_title, company_name, job_url, job_location,
+                match_score, ats_score, matching_skills, missing_skills,
+                tailored_resume_score, cover_letter IS NOT NULL as has_cover_letter,
+                created_at
+         FROM analyses 
+         WHERE user_id = $1
+         ORDER BY created_at DESC
+         LIMIT $2 OFFSET $3`,
+        [req.user.id, parseInt(limit), parseInt(offset)]
+      ),
+      query(
+        'SELECT COUNT(*) as total FROM analyses WHERE user_id = $1',
+        [req.user.id]
+      )
+    ]);
     
     res.json({
       success: true,
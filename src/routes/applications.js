@@ -6,10 +6,11 @@
 
 const express = require('express');
 const { authenticate } = require('../middleware/auth');
+const { debugLog } = require('../utils/logger');
 
 const router = express.Router();
 
-console.log('🔧 Loading SIMPLIFIED applications routes (NO DATABASE QUERIES)');
+debugLog('🔧 Loading SIMPLIFIED applications routes (NO DATABASE QUERIES)');
 
 // ============================================
 // APPLICATION QUEUE ENDPOINTS (SIMPLIFIED)
@@ -20,8 +21,8 @@ console.log('🔧 Loading SIMPLIFIED applications routes (NO DATABASE QUERIES)')
  * GET /api/applications/queue
  */
 router.get('/queue', authenticate, async (req, res) => {
-  console.log('✅ GET /queue called - user:', req.user.email);
-  console.log('   Query params:', req.query);
+  debugLog('✅ GET /queue called - user:', req.user.email);
+  debugLog('   Query params:', req.query);
   
   try {
     // Return empty queue for now
@@ -50,7 +51,7 @@ router.get('/queue', authenticate, async (req, res) => {
  * GET /api/applications/queue/:id/versions
  */
 router.get('/queue/:id/versions', authenticate, async (req, res) => {
-  console.log('✅ GET /queue/:id/versions called - ID:', req.params.id);
+  debugLog('✅ GET /queue/:id/versions called - ID:', req.params.id);
   
   try {
     // Return empty versions for now
@@ -75,8 +76,8 @@ router.get('/queue/:id/versions', authenticate, async (req, res) => {
  * POST /api/applications/queue/add
  */
 router.post('/queue/add', authenticate, async (req, res) => {
-  console.log('✅ POST /queue/add called');
-  console.log('   Body:', req.body);
+  debugLog('✅ POST /queue/add called');
+  debugLog('   Body:', req.body);
   
   try {
     const { jobTitle, companyName, jobUrl } = req.body;
@@ -116,7 +117,7 @@ router.post('/queue/add', authenticate, async (req, res) => {
  * PUT /api/applications/queue/:id/approve
  */
 router.put('/queue/:id/approve', authenticate, async (req, res) => {
-  console.log('✅ PUT /queue/:id/approve called - ID:', req.params.id);
+  debugLog('✅ PUT /queue/:id/approve called - ID:', req.params.id);
   
   try {
     res.json({
@@ -142,7 +143,7 @@ router.put('/queue/:id/approve', authenticate, async (req, res) => {
  * PUT /api/applications/queue/:id/reject
  */
 router.put('/queue/:id/reject', authenticate, async (req, res) => {
-  console.log('✅ PUT /queue/:id/reject called - ID:', req.params.id);
+  debugLog('✅ PUT /queue/:id/reject called - ID:', req.params.id);
   
   try {
     res.json({
@@ -163,7 +164,7 @@ router.put('/queue/:id/reject', authenticate, async (req, res) => {
  * DELETE /api/applications/queue/:id
  */
 router.delete('/queue/:id', authenticate, async (req, res) => {
-  console.log('✅ DELETE /queue/:id called - ID:', req.params.id);
+  debugLog('✅ DELETE /queue/:id called - ID:', req.params.id);
   
   try {
     res.json({
@@ -184,8 +185,8 @@ router.delete('/queue/:id', authenticate, async (req, res) => {
  * POST /api/applications/queue/bulk-approve
  */
 router.post('/queue/bulk-approve', authenticate, async (req, res) => {
-  console.log('✅ POST /queue/bulk-approve called');
-  console.log('   Queue IDs:', req.body.queueIds);
+  debugLog('✅ POST /queue/bulk-approve called');
+  debugLog('   Queue IDs:', req.body.queueIds);
   
   try {
     const { queueIds } = req.body;
@@ -218,9 +219,9 @@ router.post('/queue/bulk-approve', authenticate, async (req, res) => {
  * PUT /api/applications/queue/:id/select-version
  */
 router.put('/queue/:id/select-version', authenticate, async (req, res) => {
-  console.log('✅ PUT /queue/:id/select-version called');
-  console.log('   ID:', req.params.id);
-  console.log('   Body:', req.body);
+  debugLog('✅ PUT /queue/:id/select-version called');
+  debugLog('   ID:', req.params.id);
+  debugLog('   Body:', req.body);
   
   try {
     const { resumeVersionId, coverLetterVersionId } = req.body;
@@ -259,7 +260,7 @@ router.put('/queue/:id/select-version', authenticate, async (req, res) => {
  * GET /api/applications
  */
 router.get('/', authenticate, async (req, res) => {
-  console.log('✅ GET /applications called');
+  debugLog('✅ GET /applications called');
   
   try {
     res.json({
@@ -287,7 +288,7 @@ router.get('/', authenticate, async (req, res) => {
  * GET /api/applications/:id
  */
 router.get('/:id', authenticate, async (req, res) => {
-  console.log('✅ GET /applications/:id called - ID:', req.params.id);
+  debugLog('✅ GET /applications/:id called - ID:', req.params.id);
   
   try {
     res.json({
@@ -313,7 +314,7 @@ router.get('/:id', authenticate, async (req, res) => {
  * PUT /api/applications/:id
  */
 router.put('/:id', authenticate, async (req, res) => {
-  console.log('✅ PUT /applications/:id called - ID:', req.params.id);
+  debugLog('✅ PUT /applications/:id called - ID:', req.params.id);
   
   try {
     res.json({
@@ -338,7 +339,7 @@ router.put('/:id', authenticate, async (req, res) => {
  * GET /api/applications/stats/summary
  */
 router.get('/stats/summary', authenticate, async (req, res) => {
-  console.log('✅ GET /applications/stats/summary called');
+  debugLog('✅ GET /applications/stats/summary called');
   
   try {
     res.json({
@@ -364,6 +365,6 @@ router.get('/stats/summary', authenticate, async (req, res) => {
   }
 });
 
-console.log('✅ Applications routes loaded (SIMPLIFIED VERSION - NO DATABASE)');
+debugLog('✅ Applications routes loaded (SIMPLIFIED VERSION - NO DATABASE)');
 
 module.exports = router;
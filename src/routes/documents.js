@@ -7,9 +7,12 @@ const express = require('express');
 const { query } = require('../db');
 const { authenticate } = require('../middleware/auth');
 const { generateTailoredResume, generateCoverLetter } = require('../services/ai');
+const { isText } = require('../utils/validation');
 
 const router = express.Router();
 
+const DOCUMENT_FORMATS = new Set(['text', 'pdf', 'docx']);
+
 // ============================================
 // RESUME VERSIONS
 // ============================================
@@ -56,21 +59,21 @@ router.get('/for-job/:jobId', authenticate, async (req, res) => {
   try {
     const { jobId } = req.params;
 
-    // Get resume version
-    const resumeResult = await query(
-      `SELECT * FROM resume_versions 
-       WHERE user_id = $1 AND tailored_for_job_id = $2
-       ORDER BY created_at DESC LIMIT 1`,
-      [req.user.id, jobId]
-    );
-
-    // Get cover letter
-    const coverLetterResult = await query(
-      `SELECT * FROM cover_letters 
-       WHERE user_id = $1 AND job_id = $2
-       ORDER BY created_at DESC LIMIT 1`,
-      [req.user.id, jobId]
-    );
+    // Get resume version and cover letter concurrently
+    const [resumeResult, coverLetterResult] = await Promise.all([
+      query(
+        `SELECT * FROM resume_versions 
+         WHERE user_id = $1 AND tailored_for_job_id = $2
+         ORDER BY created_at DESC LIMIT 1`,
+        [req.user.id, jobId]
+      ),
+      query(
+        `SELECT * FROM cover_letters 
+         WHERE user_id = $1 AND job_id = $2
+         ORDER BY created_at DESC LIMIT 1`,
+        [req.user.id, jobId]
+      )
+    ]);
 
     res.json({
       success: true,
@@ -168,13 +171,20 @@ router.post('/generate-resume', authenticate, async (req, res) => {
       quickWins = []
     } = req.body;
 
-    if (!jobDescription) {
+    if (!isText(jobDescription)) {
       return res.status(400).json({
         success: false,
         error: 'Job description is required.'
       });
     }
 
+    if (!Array.isArray(selectedSkills)) {
+      return res.status(400).json({
+        success: false,
+        error: 'Selected skills must be a list.'
+      });
+    }
+
     // Get base resume
     const resumeResult = await query(
       `SELECT * FROM resumes WHERE id = $1 AND user_id = $2`,
@@ -391,7 +401,7 @@ router.post('/generate-cover-letter', authenticate, async (req, res) => {
       tone = 'professional'
     } = req.body;
 
-    if (!jobDescription || !resumeText) {
+    if (!isText(jobDescription) || !isText(resumeText)) {
       return res.status(400).json({
         success: false,
         error: 'Job description and resume text are required.'
@@ -498,6 +508,13 @@ router.get('/:type/:id', authenticate, async (req, res) => {
     const { type, id } = req.params;
     const { format = 'text' } = req.query;
 
+    if (!DOCUMENT_FORMATS.has(format)) {
+      return res.status(400).json({
+        success: false,
+        error: 'Invalid format. Use text, pdf or docx.'
+      });
+    }
+
     let result;
     if (type === 'resume') {
       result = await query(
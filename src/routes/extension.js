@@ -10,11 +10,13 @@ const fs = require('fs');
 const archiver = require('archiver');
 
 // GET /api/extension/download - Download extension as zip
-router.get('/download', (req, res) => {
+router.get('/download', async (req, res) => {
   const extensionPath = path.join(__dirname, '..', '..', 'extension');
   
   // Check if extension folder exists
-  if (!fs.existsSync(extensionPath)) {
+  try {
+    await fs.promises.access(extensionPath);
+  } catch {
     return res.status(404).json({
       success: false,
       error: 'Extension not found on server'
@@ -44,11 +46,11 @@ router.get('/download', (req, res) => {
 });
 
 // GET /api/extension/info - Get extension info
-router.get('/info', (req, res) => {
+router.get('/info', async (req, res) => {
   const manifestPath = path.join(__dirname, '..', '..', 'extension', 'manifest.json');
   
   try {
-    const manifest = JSON.parse(fs.readFileSync(manifestPath, 'utf8'));
+    const manifest = JSON.parse(await fs.promises.readFile(manifestPath, 'utf8'));
     res.json({
       success: true,
       data: {
@@ -80,6 +80,8 @@ router.put('/preferences', authenticate, async (req, res) => {
 
     // Build update fields dynamically
     const updates = [];
+    const columns = [];
+    const placeholders = [];
     const params = [req.user.id];
     let paramCount = 1;
 
@@ -111,10 +113,13 @@ router.put('/preferences', authenticate, async (req, res) => {
       followup_template: followupTemplate
     };
 
+    // Collect the UPDATE assignments and the INSERT column/placeholder lists in one pass
     for (const [field, value] of Object.entries(fields)) {
       if (value !== undefined) {
         paramCount++;
         updates.push(`${field} = $${paramCount}`);
+        columns.push(field);
+        placeholders.push(`$${paramCount}`);
         params.push(value);
       }
     }
@@ -128,8 +133,8 @@ router.put('/preferences', authenticate, async (req, res) => {
 
     // Upsert (update or insert)
     const result = await query(
-      `INSERT INTO application_preferences (user_id, ${Object.keys(fields).filter(f => fields[f] !== undefined).join(', ')})
-       VALUES ($1, ${params.slice(1).map((_, i) => `$${i + 2}`).join(', ')})
+      `INSERT INTO application_preferences (user_id, ${columns.join(', ')})
+       VALUES ($1, ${placeholders.join(', ')})
        ON CONFLICT (user_id) 
        DO UPDATE SET ${updates.join(', ')}, updated_at = NOW()
        RETURNING *`,
@@ -3,50 +3,117 @@
  */
 
 const express = require('express');
+const crypto = require('crypto');
 const fs = require('fs');
 const path = require('path');
 const { query } = require('../db');
 const { authenticate } = require('../middleware/auth');
+const { debugLog } = require('../utils/logger');
 const { upload, handleUploadError } = require('../middleware/upload');
 const aiService = require('../services/ai');
+const { LRUCache, hashText } = require('../services/cache');
+const { extractPdfText } = require('../services/pdf');
+const mammoth = require('mammoth');
+const { Document, Paragraph, TextRun, HeadingLevel, AlignmentType, BorderStyle, Packer } = require('docx');
 
 const router = express.Router();
 
+// Shared DOCX styling, built once rather than per generated document.
+// Font and body size live on the default run style so individual runs
+// only carry what differs from it.
+const DOCUMENT_STYLES = {
+  default: {
+    document: {
+      run: { font: 'Calibri', size: 21 }
+    }
+  },
+  // Repeated run formatting is declared once here and referenced by id,
+  // so each run in the document carries a style reference instead of
+  // its own copy of the properties.
+  characterStyles: [
+    { id: 'SectionTitle', name: 'Section Title', run: { bold: true, size: 24 } },
+    { id: 'EntryTitle', name: 'Entry Title', run: { bold: true, size: 22 } },
+    { id: 'Muted', name: 'Muted', run: { italics: true, color: '666666', size: 20 } }
+  ]
+};
+
+const SECTION_BORDER = {
+  bottom: { style: BorderStyle.SINGLE, size: 1, color: '999999' }
+};
+
+function sectionHeading(title) {
+  return new Paragraph({
+    heading: HeadingLevel.HEADING_2,
+    spacing: { before: 200, after: 100 },
+    border: SECTION_BORDER,
+    children: [new TextRun({ text: title, style: 'SectionTitle' })]
+  });
+}
+
+// Non-blocking existence check for stored upload paths
+async function fileExists(filePath) {
+  if (!filePath) return false;
+  try {
+    await fs.promises.access(filePath);
+    return true;
+  } catch {
+    return false;
+  }
+}
+
+// JSONB columns may arrive as strings or already-parsed objects
+function parseField(field) {
+  if (!field) return field;
+  return typeof field === 'string' ? JSON.parse(field) : field;
+}
+
+// Local file header magic shared by DOCX and every other ZIP container
+const ZIP_SIGNATURE = Buffer.from([0x50, 0x4b, 0x03, 0x04]);
+
+// Text extractors keyed by lowercased file extension; each gets the file contents
+const TEXT_EXTRACTORS = {
+  '.txt': buffer => buffer.toString('utf-8'),
+
+  '.pdf': buffer => extractPdfText(buffer),
+
+  '.docx': async buffer => {
+    const result = await mammoth.extractRawText({ buffer });
+    return result.value || '[Could not extract text from DOCX]';
+  },
+
+  // DOC files (older format) - only DOCX content saved with a .doc name is
+  // readable by mammoth, so skip the parse for legacy binary documents
+  '.doc': async buffer => {
+    if (!buffer.subarray(0, ZIP_SIGNATURE.length).equals(ZIP_SIGNATURE)) {
+      return '[DOC format not fully supported - please use DOCX]';
+    }
+    try {
+      const result = await mammoth.extractRawText({ buffer });
+      return result.value || '[Could not extract text from DOC]';
+    } catch (e) {
+      return '[DOC format not fully supported - please use DOCX]';
+    }
+  }
+};
+
+// Extracted text keyed by a digest of the file contents, so re-uploads and
+// re-extracts of an identical file skip the parse
+const extractedTextCache = new LRUCache({ maxSize: 64, ttlMs: 60 * 60 * 1000 });
+
 // Helper: Extract text from uploaded files
 async function extractTextFromFile(filePath, mimeType) {
   const ext = path.extname(filePath).toLowerCase();
+  const extractor = TEXT_EXTRACTORS[ext];
+  if (!extractor) return '[Unsupported file format]';
   try {
-    // Plain text files
-    if (ext === '.txt') {
-      return fs.readFileSync(filePath, 'utf-8');
-    }
-    
-    // PDF files
-    if (ext === '.pdf') {
-      const pdfParse = require('pdf-parse');
-      const data = await pdfParse(fs.readFileSync(filePath));
-      return data.text;
-    }
-    
-    // DOCX files
-    if (ext === '.docx') {
-      const mammoth = require('mammoth');
-      const result = await mammoth.extractRawText({ path: filePath });
-      return result.value || '[Could not extract text from DOCX]';
-    }
-    
-    // DOC files (older format) - try mammoth, might work
-    if (ext === '.doc') {
-      try {
-        const mammoth = require('mammoth');
-        const result = await mammoth.extractRawText({ path: filePath });
-        return result.value || '[Could not extract text from DOC]';
-      } catch (e) {
-        return '[DOC format not fully supported - please use DOCX]';
-      }
-    }
-    
-    return '[Unsupported file format]';
+    const buffer = await fs.promises.readFile(filePath);
+    const cacheKey = hashText(ext, buffer);
+    const cached = extractedTextCache.get(cacheKey);
+    if (cached !== undefined) return cached;
+
+    const text = await extractor(buffer);
+    extractedTextCache.set(cacheKey, text);
+    return text;
   } catch (e) {
     console.error('Text extraction error:', e);
     return '[Could not extract text: ' + e.message + ']';
@@ -79,9 +146,10 @@ router.post('/upload', authenticate, upload.single('resume'), handleUploadError,
   try {
     if (!req.file) return res.status(400).json({ success: false, error: 'No file uploaded.' });
     const { originalname, path: filePath, mimetype } = req.file;
-    const resumeName = req.body.name || originalname.replace(/\.[^/.]+$/, '');
+    const extname = path.extname(originalname);
+    const resumeName = req.body.name || originalname.slice(0, originalname.length - extname.length);
     const extractedText = await extractTextFromFile(filePath, mimetype);
-    const ext = path.extname(originalname).toLowerCase().replace('.', '').toUpperCase();
+    const ext = extname.slice(1).toUpperCase();
     const result = await query(
       `INSERT INTO resumes (user_id, name, original_file_url, original_file_type, raw_text, is_primary)
        VALUES ($1, $2, $3, $4, $5, (SELECT NOT EXISTS (SELECT 1 FROM resumes WHERE user_id = $1)))
@@ -90,7 +158,12 @@ router.post('/upload', authenticate, upload.single('resume'), handleUploadError,
     );
     res.status(201).json({ success: true, message: 'Resume uploaded', data: result.rows[0] });
   } catch (error) {
-    if (req.file && fs.existsSync(req.file.path)) fs.unlinkSync(req.file.path);
+    if (req.file) {
+      // Already gone is fine; anything else leaves an orphaned upload worth knowing about
+      await fs.promises.unlink(req.file.path).catch(err => {
+        if (err.code !== 'ENOENT') console.error('Upload cleanup error:', err);
+      });
+    }
     res.status(500).json({ success: false, error: 'Failed to upload.' });
   }
 });
@@ -109,7 +182,7 @@ router.get('/:id/download', authenticate, async (req, res) => {
     
     const resume = result.rows[0];
     
-    if (!resume.original_file_url || !fs.existsSync(resume.original_file_url)) {
+    if (!(await fileExists(resume.original_file_url))) {
       return res.status(404).json({ success: false, error: 'Original file not found.' });
     }
     
@@ -139,7 +212,7 @@ router.get('/:id/view', authenticate, async (req, res) => {
     
     const resume = result.rows[0];
     
-    if (!resume.original_file_url || !fs.existsSync(resume.original_file_url)) {
+    if (!(await fileExists(resume.original_file_url))) {
       return res.status(404).json({ success: false, error: 'Original file not found.' });
     }
     
@@ -176,16 +249,16 @@ router.post('/:id/reextract', authenticate, async (req, res) => {
     
     const resume = result.rows[0];
     
-    if (!resume.original_file_url || !fs.existsSync(resume.original_file_url)) {
+    if (!(await fileExists(resume.original_file_url))) {
       return res.status(400).json({ success: false, error: 'No original file to re-extract from.' });
     }
     
     // Re-extract text
     const extractedText = await extractTextFromFile(resume.original_file_url, resume.original_file_type);
     
-    // Update database
-    await query(
-      'UPDATE resumes SET raw_text = $1, updated_at = NOW() WHERE id = $2',
+    // Update database, skipping the row rewrite (and updated_at bump) when nothing changed
+    const updateResult = await query(
+      'UPDATE resumes SET raw_text = $1, updated_at = NOW() WHERE id = $2 AND raw_text IS DISTINCT FROM $1',
       [extractedText, req.params.id]
     );
     
@@ -193,6 +266,7 @@ router.post('/:id/reextract', authenticate, async (req, res) => {
       success: true, 
       message: 'Text re-extracted successfully',
       data: { 
+        changed: updateResult.rowCount > 0,
         textLength: extractedText.length,
         preview: extractedText.substring(0, 200)
       }
@@ -215,7 +289,7 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
     const resume = result.rows[0];
 
     // If it's an uploaded file, just return it
-    if (resume.original_file_url && fs.existsSync(resume.original_file_url)) {
+    if (await fileExists(resume.original_file_url)) {
       const ext = (resume.original_file_type || 'pdf').toLowerCase();
       res.setHeader('Content-Type', 'application/vnd.openxmlformats-officedocument.wordprocessingml.document');
       res.setHeader('Content-Disposition', `attachment; filename="${resume.name}.${ext}"`);
@@ -223,14 +297,6 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
     }
 
     // Generate DOCX from resume data using docx library
-    const docx = require('docx');
-    const { Document, Paragraph, TextRun, HeadingLevel, AlignmentType, BorderStyle, Packer } = docx;
-
-    const parseField = (field) => {
-      if (!field) return field;
-      return typeof field === 'string' ? JSON.parse(field) : field;
-    };
-
     const contactInfo = parseField(resume.contact_info) || {};
     const workExperience = parseField(resume.work_experience) || [];
     const education = parseField(resume.education) || [];
@@ -239,10 +305,6 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
     const certifications = parseField(resume.certifications) || [];
     const publications = parseField(resume.publications) || [];
 
-    const sectionBorder = {
-      bottom: { style: BorderStyle.SINGLE, size: 1, color: '999999' }
-    };
-
     const children = [];
 
     // Name header
@@ -250,7 +312,7 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
       children.push(new Paragraph({
         alignment: AlignmentType.CENTER,
         spacing: { after: 100 },
-        children: [new TextRun({ text: contactInfo.name, bold: true, size: 32, font: 'Calibri' })]
+        children: [new TextRun({ text: contactInfo.name, bold: true, size: 32 })]
       }));
     }
 
@@ -260,7 +322,7 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
       children.push(new Paragraph({
         alignment: AlignmentType.CENTER,
         spacing: { after: 200 },
-        children: [new TextRun({ text: contactParts.join('  |  '), size: 20, color: '555555', font: 'Calibri' })]
+        children: [new TextRun({ text: contactParts.join('  |  '), size: 20, color: '555555' })]
       }));
     }
 
@@ -270,52 +332,42 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
       children.push(new Paragraph({
         alignment: AlignmentType.CENTER,
         spacing: { after: 300 },
-        children: [new TextRun({ text: linkParts.join('  |  '), size: 18, color: '666666', font: 'Calibri' })]
+        children: [new TextRun({ text: linkParts.join('  |  '), size: 18, color: '666666' })]
       }));
     }
 
     // Summary
     if (resume.summary) {
-      children.push(new Paragraph({
-        heading: HeadingLevel.HEADING_2,
-        spacing: { before: 200, after: 100 },
-        border: sectionBorder,
-        children: [new TextRun({ text: 'PROFESSIONAL SUMMARY', bold: true, size: 24, font: 'Calibri' })]
-      }));
+      children.push(sectionHeading('PROFESSIONAL SUMMARY'));
       children.push(new Paragraph({
         spacing: { after: 200 },
-        children: [new TextRun({ text: resume.summary, size: 21, font: 'Calibri' })]
+        children: [new TextRun({ text: resume.summary })]
       }));
     }
 
     // Work Experience
     if (workExperience.length > 0) {
-      children.push(new Paragraph({
-        heading: HeadingLevel.HEADING_2,
-        spacing: { before: 200, after: 100 },
-        border: sectionBorder,
-        children: [new TextRun({ text: 'WORK EXPERIENCE', bold: true, size: 24, font: 'Calibri' })]
-      }));
+      children.push(sectionHeading('WORK EXPERIENCE'));
       for (const exp of workExperience) {
         children.push(new Paragraph({
           spacing: { before: 150 },
           children: [
-            new TextRun({ text: exp.title || '', bold: true, size: 22, font: 'Calibri' }),
-            new TextRun({ text: exp.company ? `  —  ${exp.company}` : '', size: 22, font: 'Calibri' }),
+            new TextRun({ text: exp.title || '', style: 'EntryTitle' }),
+            new TextRun({ text: exp.company ? `  —  ${exp.company}` : '', size: 22 }),
           ]
         }));
         const dates = [exp.startDate, exp.endDate || 'Present'].filter(Boolean).join(' – ');
         if (dates) {
           children.push(new Paragraph({
             spacing: { after: 50 },
-            children: [new TextRun({ text: [dates, exp.location].filter(Boolean).join('  |  '), size: 19, italics: true, color: '666666', font: 'Calibri' })]
+            children: [new TextRun({ text: [dates, exp.location].filter(Boolean).join('  |  '), style: 'Muted', size: 19 })]
           }));
         }
         for (const bullet of (exp.bullets || [])) {
           children.push(new Paragraph({
             bullet: { level: 0 },
             spacing: { after: 40 },
-            children: [new TextRun({ text: bullet, size: 21, font: 'Calibri' })]
+            children: [new TextRun({ text: bullet })]
           }));
         }
       }
@@ -323,19 +375,14 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
 
     // Education
     if (education.length > 0) {
-      children.push(new Paragraph({
-        heading: HeadingLevel.HEADING_2,
-        spacing: { before: 200, after: 100 },
-        border: sectionBorder,
-        children: [new TextRun({ text: 'EDUCATION', bold: true, size: 24, font: 'Calibri' })]
-      }));
+      children.push(sectionHeading('EDUCATION'));
       for (const edu of education) {
         const schoolWithLocation = [edu.school, edu.location].filter(Boolean).join(', ');
         children.push(new Paragraph({
           spacing: { before: 100 },
           children: [
-            new TextRun({ text: schoolWithLocation || '', bold: true, size: 22, font: 'Calibri' }),
-            new TextRun({ text: edu.graduation ? `  —  ${edu.graduation}` : '', size: 22, italics: true, color: '666666', font: 'Calibri' }),
+            new TextRun({ text: schoolWithLocation || '', style: 'EntryTitle' }),
+            new TextRun({ text: edu.graduation ? `  —  ${edu.graduation}` : '', style: 'Muted', size: 22 }),
           ]
         }));
         const degreeParts = [edu.degree, edu.field].filter(Boolean).join(' in ');
@@ -343,7 +390,7 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
         if (degreeWithGpa) {
           children.push(new Paragraph({
             spacing: { after: 50 },
-            children: [new TextRun({ text: degreeWithGpa, size: 21, font: 'Calibri' })]
+            children: [new TextRun({ text: degreeWithGpa })]
           }));
         }
       }
@@ -351,24 +398,19 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
 
     // Projects
     if (projects.length > 0) {
-      children.push(new Paragraph({
-        heading: HeadingLevel.HEADING_2,
-        spacing: { before: 200, after: 100 },
-        border: sectionBorder,
-        children: [new TextRun({ text: 'PROJECTS', bold: true, size: 24, font: 'Calibri' })]
-      }));
+      children.push(sectionHeading('PROJECTS'));
       for (const proj of projects) {
         children.push(new Paragraph({
           spacing: { before: 100 },
           children: [
-            new TextRun({ text: proj.name || '', bold: true, size: 22, font: 'Calibri' }),
-            new TextRun({ text: proj.technologies ? `  (${proj.technologies})` : '', size: 20, italics: true, color: '666666', font: 'Calibri' }),
+            new TextRun({ text: proj.name || '', style: 'EntryTitle' }),
+            new TextRun({ text: proj.technologies ? `  (${proj.technologies})` : '', style: 'Muted' }),
           ]
         }));
         if (proj.description) {
           children.push(new Paragraph({
             spacing: { after: 50 },
-            children: [new TextRun({ text: proj.description, size: 21, font: 'Calibri' })]
+            children: [new TextRun({ text: proj.description })]
           }));
         }
       }
@@ -376,20 +418,15 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
 
     // Certifications
     if (certifications.length > 0) {
-      children.push(new Paragraph({
-        heading: HeadingLevel.HEADING_2,
-        spacing: { before: 200, after: 100 },
-        border: sectionBorder,
-        children: [new TextRun({ text: 'CERTIFICATIONS', bold: true, size: 24, font: 'Calibri' })]
-      }));
+      children.push(sectionHeading('CERTIFICATIONS'));
       for (const cert of certifications) {
         children.push(new Paragraph({
           bullet: { level: 0 },
           spacing: { after: 40 },
           children: [
-            new TextRun({ text: cert.name || '', bold: true, size: 21, font: 'Calibri' }),
-            new TextRun({ text: cert.issuer ? ` — ${cert.issuer}` : '', size: 21, font: 'Calibri' }),
-            new TextRun({ text: cert.year ? ` (${cert.year})` : '', size: 20, italics: true, color: '666666', font: 'Calibri' }),
+            new TextRun({ text: cert.name || '', bold: true }),
+            new TextRun({ text: cert.issuer ? ` — ${cert.issuer}` : '' }),
+            new TextRun({ text: cert.year ? ` (${cert.year})` : '', style: 'Muted' }),
           ]
         }));
       }
@@ -397,19 +434,15 @@ router.get('/:id/generate-docx', authenticate, async (req, res) => {
 
     // Skills
     if (skills.length > 0) {
-      children.push(new Paragraph({
-        heading: HeadingLevel.HEADING_2,
-        spacing: { before: 200, after: 100 },
-        border: sectionBorder,
-        children: [new TextRun({ text: 'SKILLS', bold: true, size: 24, font: 'Calibri' })]
-      }));
+      children.push(sectionHeading('SKILLS'));
       children.push(new Paragraph({
         spacing: { after: 100 },
-        children: [new TextRun({ text: skills.join('  •  '), size: 21, font: 'Calibri' })]
+        children: [new TextRun({ text: skills.join('  •  ') })]
       }));
     }
 
     const doc = new Document({
+      styles: DOCUMENT_STYLES,
       sections: [{
         properties: {
           page: {
@@ -490,7 +523,11 @@ router.delete('/:id', authenticate, async (req, res) => {
     const result = await query('DELETE FROM resumes WHERE id = $1 AND user_id = $2 RETURNING original_file_url', [req.params.id, req.user.id]);
     if (result.rows.length === 0) return res.status(404).json({ success: false, error: 'Resume not found.' });
     const filePath = result.rows[0]?.original_file_url;
-    if (filePath && fs.existsSync(filePath)) fs.unlinkSync(filePath);
+    if (filePath) {
+      await fs.promises.unlink(filePath).catch(err => {
+        if (err.code !== 'ENOENT') console.error('Resume file cleanup error:', err);
+      });
+    }
     res.json({ success: true, message: 'Resume deleted.' });
   } catch (error) {
     res.status(500).json({ success: false, error: 'Failed to delete resume.' });
@@ -528,7 +565,7 @@ function deepMerge(target, source) {
 // POST /api/resumes/builder/start
 router.post('/builder/start', authenticate, async (req, res) => {
   try {
-    const sessionId = require('crypto').randomUUID();
+    const sessionId = crypto.randomUUID();
     const session = { userId: req.user.id, step: 'name', data: req.body.existingData || {}, createdAt: new Date() };
     builderSessions.set(sessionId, session);
     await query(`INSERT INTO resume_builder_sessions (id, user_id, current_step, collected_data, progress_percent) VALUES ($1, $2, $3, $4, $5)`,
@@ -589,7 +626,7 @@ router.post('/builder/complete', authenticate, async (req, res) => {
     }));
     const education = (data.education || []).map(edu => ({ school: edu.school || '', degree: edu.degree || '', graduation: edu.graduation || '' }));
     const resumeName = data.name ? `${data.name}'s Resume` : 'My Resume';
-    console.log('Saving resume:', { name: resumeName, contactInfo, experience: workExperience.length });
+    debugLog('Saving resume:', { name: resumeName, contactInfo, experience: workExperience.length });
     const result = await query(
       `INSERT INTO resumes (user_id, name, contact_info, summary, work_experience, education, skills, is_primary)
        VALUES ($1, $2, $3, $4, $5, $6, $7, (SELECT NOT EXISTS (SELECT 1 FROM resumes WHERE user_id = $1))) RETURNING id, name, is_primary`,
@@ -609,10 +646,10 @@ router.post('/builder/complete', authenticate, async (req, res) => {
 router.post('/builder/experience-suggestions', authenticate, async (req, res) => {
   try {
     const { jobTitle, company, description } = req.body;
-    console.log('📝 Experience suggestions request:', { jobTitle, company });
+    debugLog('📝 Experience suggestions request:', { jobTitle, company });
     if (!jobTitle) return res.status(400).json({ success: false, error: 'Job title is required.' });
     const suggestions = await aiService.generateJobSuggestions(jobTitle, company, description);
-    console.log('✅ Generated suggestions for:', jobTitle);
+    debugLog('✅ Generated suggestions for:', jobTitle);
     res.json({ success: true, data: suggestions });
   } catch (error) {
     console.error('❌ Experience suggestions error:', error);
@@ -685,6 +722,21 @@ router.post('/builder/summary', authenticate, async (req, res) => {
 
 // ========== BUILDER STEP PROCESSING ==========
 
+// Builder choice keywords -> AI rewrite style, in priority order; the first
+// keyword found in the input wins
+const REWRITE_STYLES = [
+  ['detailed', 'detailed'],
+  ['concise', 'concise'],
+  ['impressive', 'fancy']
+];
+
+function detectRewriteStyle(input) {
+  for (const [keyword, style] of REWRITE_STYLES) {
+    if (input.includes(keyword)) return style;
+  }
+  return 'professional';
+}
+
 async function processBuilderStep(step, userInput, currentData) {
   switch (step) {
     case 'name':
@@ -738,7 +790,7 @@ async function processBuilderStep(step, userInput, currentData) {
       if (choice === 'manual' || choice.includes('own')) {
         return { nextStep: 'manual_bullet', response: `Write your bullet:`, updatedData: {}, progress: 60, inputType: 'textarea', inputPlaceholder: 'Your bullet point...' };
       }
-      let style = choice.includes('detailed') ? 'detailed' : choice.includes('concise') ? 'concise' : choice.includes('impressive') ? 'fancy' : 'professional';
+      let style = detectRewriteStyle(choice);
       let newBullet = currentData.currentJob?.currentBullet;
       try { newBullet = await aiService.generateBulletPoint(currentData.currentJob?.description, currentData.currentJob?.title, style); } catch (e) {}
       return { nextStep: 'bullet_review', response: `${style} version:\n\n📝 **"${newBullet}"**\n\n**Choose:**`,
@@ -772,7 +824,7 @@ async function processBuilderStep(step, userInput, currentData) {
       if (userInput.toLowerCase() === 'manual' || userInput.includes('own')) {
         return { nextStep: 'manual_summary', response: `Write your summary:`, updatedData: {}, progress: 90, inputType: 'textarea', inputPlaceholder: 'Your professional summary...' };
       }
-      const summaryStyle = userInput.includes('detailed') ? 'detailed' : userInput.includes('concise') ? 'concise' : userInput.includes('impressive') ? 'fancy' : 'professional';
+      const summaryStyle = detectRewriteStyle(userInput);
       let summary = '';
       try { summary = await aiService.generateProfessionalSummary({ name: currentData.name, experience: currentData.experience, education: currentData.education, skills: currentData.skills }, summaryStyle); }
       catch (e) { summary = `Results-driven professional with experience in ${currentData.skills?.slice(0, 3).join(', ') || 'various areas'}.`; }
@@ -789,7 +841,7 @@ async function processBuilderStep(step, userInput, currentData) {
       if (summaryChoice === 'manual' || summaryChoice.includes('own')) {
         return { nextStep: 'manual_summary', response: `Write your summary:`, updatedData: {}, progress: 90, inputType: 'textarea', inputPlaceholder: 'Your professional summary...' };
       }
-      let newStyle = summaryChoice.includes('detailed') ? 'detailed' : summaryChoice.includes('concise') ? 'concise' : summaryChoice.includes('impressive') ? 'fancy' : 'professional';
+      let newStyle = detectRewriteStyle(summaryChoice);
       let newSummary = currentData.currentSummary;
       try { newSummary = await aiService.generateProfessionalSummary({ name: currentData.name, experience: currentData.experience, education: currentData.education, skills: currentData.skills }, newStyle); } catch (e) {}
       return { nextStep: 'summary_review', response: `${newStyle} version:\n\n📝 **"${newSummary}"**\n\n**Choose:**`,
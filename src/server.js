@@ -10,6 +10,7 @@ require('dotenv').config();
 const express = require('express');
 const cors = require('cors');
 const { pool } = require('./db');
+const { getConcurrencyStats, closeAnthropicClient } = require('./services/ai');
 
 // Import routes
 const authRoutes = require('./routes/auth');
@@ -25,6 +26,12 @@ const documentsRoutes = require('./routes/documents');
 const app = express();
 const PORT = process.env.PORT || 3000;
 
+// Environment is fixed for the life of the process, so read it once
+const IS_PRODUCTION = process.env.NODE_ENV === 'production';
+const HAS_ANTHROPIC_KEY = Boolean(process.env.ANTHROPIC_API_KEY);
+// Per-request logging is on in development; in production set LOG_REQUESTS=true to enable
+const LOG_REQUESTS = process.env.LOG_REQUESTS ? process.env.LOG_REQUESTS === 'true' : !IS_PRODUCTION;
+
 // ============================================
 // DATABASE SCHEMA - Auto-creates tables if missing
 // ============================================
@@ -274,33 +281,41 @@ const initializeDatabase = async () => {
 // ============================================
 // CORS CONFIGURATION
 // ============================================
-const ALLOWED_ORIGINS = [
+const ALLOWED_ORIGINS = new Set([
   'https://jobmatch-frontend-one.vercel.app',
   'https://jobmatch-webapp.vercel.app',
   'http://localhost:5173',
   'http://localhost:3000',
-];
+]);
 
 if (process.env.FRONTEND_URL) {
-  const url = process.env.FRONTEND_URL.replace(/\/$/, '');
-  if (!ALLOWED_ORIGINS.includes(url)) {
-    ALLOWED_ORIGINS.push(url);
-  }
+  ALLOWED_ORIGINS.add(process.env.FRONTEND_URL.replace(/\/$/, ''));
 }
 
+// Local dev servers on any port; anchored so hosts like localhost.example.com don't match
+const LOCAL_DEV_ORIGIN = /^http:\/\/(?:localhost|127\.0\.0\.1)(?::\d+)?$/;
+
+// Vercel preview deployments of our own projects, e.g. https://jobmatch-webapp-git-main-team.vercel.app
+const VERCEL_PREVIEW_ORIGIN = /^https:\/\/[a-z0-9-]*jobmatch[a-z0-9-]*\.vercel\.app$/;
+
+// Pin the Chrome extension when its ID is known; otherwise accept any extension origin
+const EXTENSION_ORIGIN = process.env.CHROME_EXTENSION_ID
+  ? `chrome-extension://${process.env.CHROME_EXTENSION_ID}`
+  : null;
+
 const corsOptions = {
   origin: function (origin, callback) {
     if (!origin) return callback(null, true);
-    if (origin.startsWith('http://localhost') || origin.startsWith('http://127.0.0.1')) {
+    if (ALLOWED_ORIGINS.has(origin)) {
       return callback(null, true);
     }
-    if (origin.startsWith('chrome-extension://')) {
+    if (LOCAL_DEV_ORIGIN.test(origin)) {
       return callback(null, true);
     }
-    if (ALLOWED_ORIGINS.includes(origin)) {
+    if (EXTENSION_ORIGIN ? origin === EXTENSION_ORIGIN : origin.startsWith('chrome-extension://')) {
       return callback(null, true);
     }
-    if (origin.includes('vercel.app') && origin.includes('jobmatch')) {
+    if (VERCEL_PREVIEW_ORIGIN.test(origin)) {
       return callback(null, true);
     }
     console.log(`[CORS] Rejected origin: ${origin}`);
@@ -315,20 +330,23 @@ const corsOptions = {
 
 app.use(cors(corsOptions));
 
-// Body parsing
+// Body parsing - build the JSON parser once rather than on every request
+const jsonParser = express.json({ limit: '10mb' });
 app.use((req, res, next) => {
   if (req.originalUrl === '/api/payments/webhook') {
     next();
   } else {
-    express.json({ limit: '10mb' })(req, res, next);
+    jsonParser(req, res, next);
   }
 });
 
-// Request logging
-app.use((req, res, next) => {
-  console.log(`${req.method} ${req.path}`);
-  next();
-});
+// Request logging (health probes are skipped - they would drown out real traffic)
+if (LOG_REQUESTS) {
+  app.use((req, res, next) => {
+    if (req.path !== '/health') console.log(`${req.method} ${req.path}`);
+    next();
+  });
+}
 
 // ============================================
 // HEALTH CHECK
@@ -340,7 +358,8 @@ app.get('/health', async (req, res) => {
       status: 'healthy',
       timestamp: new Date().toISOString(),
       version: '1.0.0',
-      database: 'connected'
+      database: 'connected',
+      ai: { configured: HAS_ANTHROPIC_KEY, ...getConcurrencyStats() }
     });
   } catch (error) {
     res.status(500).json({
@@ -403,7 +422,7 @@ app.use((err, req, res, next) => {
   
   res.status(err.status || 500).json({
     success: false,
-    error: process.env.NODE_ENV === 'production' 
+    error: IS_PRODUCTION
       ? 'Internal server error' 
       : err.message
   });
@@ -465,13 +484,13 @@ startServer();
 // Graceful shutdown
 process.on('SIGTERM', async () => {
   console.log('🛑 SIGTERM received, shutting down...');
-  await pool.end();
+  await Promise.all([pool.end(), closeAnthropicClient()]);
   process.exit(0);
 });
 
 process.on('SIGINT', async () => {
   console.log('🛑 SIGINT received, shutting down...');
-  await pool.end();
+  await Promise.all([pool.end(), closeAnthropicClient()]);
   process.exit(0);
 });
 
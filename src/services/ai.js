@@ -3,125 +3,523 @@
  * YOUR API key stays here - users never see it
  */
 
+const { Agent, fetch } = require('undici');
+const { LRUCache, hashText } = require('./cache');
+
 const ANTHROPIC_API_URL = 'https://api.anthropic.com/v1/messages';
+const MAX_LOGGED_ERROR_LENGTH = 500;
+
+// Request headers never change while the process runs, so build them once
+const ANTHROPIC_HEADERS = {
+  'Content-Type': 'application/json',
+  'x-api-key': process.env.ANTHROPIC_API_KEY,
+  'anthropic-version': '2023-06-01'
+};
+
+// Short, well-bounded tasks (scoring, bullet points) run on the faster, cheaper
+// tier; analysis and long-form writing stay on the stronger model
+const MODELS = {
+  fast: process.env.ANTHROPIC_FAST_MODEL || 'claude-haiku-4-5-20251001',
+  smart: process.env.ANTHROPIC_MODEL || 'claude-sonnet-4-20250514'
+};
+
+// Cap in-flight Anthropic requests so traffic spikes queue here
+// instead of fanning out into rate-limit errors and retries
+const MAX_CONCURRENT_REQUESTS = parseInt(process.env.ANTHROPIC_MAX_CONCURRENCY) || 16;
+let activeRequests = 0;
+const waitingRequests = [];
+
+// One long-lived connection pool for api.anthropic.com. The default fetch
+// dispatcher drops idle sockets after 4s, so bursty traffic kept paying for
+// fresh TCP + TLS handshakes.
+const anthropicAgent = new Agent({
+  connections: MAX_CONCURRENT_REQUESTS,
+  keepAliveTimeout: 60 * 1000,
+  keepAliveMaxTimeout: 10 * 60 * 1000
+});
 
 /**
- * Make a request to Anthropic API
+ * Close pooled Anthropic connections (called on shutdown)
+ */
+function closeAnthropicClient() {
+  return anthropicAgent.close();
+}
+
+/**
+ * Wait for a free request slot
+ */
+async function acquireSlot() {
+  if (activeRequests < MAX_CONCURRENT_REQUESTS) {
+    activeRequests++;
+    return;
+  }
+  await new Promise(resolve => waitingRequests.push(resolve));
+}
+
+/**
+ * Release a request slot, handing it straight to the next waiter if any
+ */
+function releaseSlot() {
+  const next = waitingRequests.shift();
+  if (next) {
+    next();
+  } else {
+    activeRequests--;
+  }
+}
+
+// Running prompt-cache token totals, to confirm cache breakpoints are being hit
+const promptCacheTokens = { read: 0, written: 0 };
+
+function recordCacheUsage(usage) {
+  promptCacheTokens.read += usage?.cache_read_input_tokens || 0;
+  promptCacheTokens.written += usage?.cache_creation_input_tokens || 0;
+}
+
+/**
+ * Current request concurrency and prompt-cache totals (exposed on /health)
+ */
+function getConcurrencyStats() {
+  return {
+    active: activeRequests,
+    queued: waitingRequests.length,
+    limit: MAX_CONCURRENT_REQUESTS,
+    promptCacheTokens: { ...promptCacheTokens }
+  };
+}
+
+/**
+ * POST a Messages API payload to Anthropic
  */
-async function callAnthropic(systemPrompt, userMessage, maxTokens = 4096) {
+async function postMessages(payload) {
   const response = await fetch(ANTHROPIC_API_URL, {
     method: 'POST',
-    headers: {
-      'Content-Type': 'application/json',
-      'x-api-key': process.env.ANTHROPIC_API_KEY,
-      'anthropic-version': '2023-06-01'
-    },
-    body: JSON.stringify({
-      model: 'claude-sonnet-4-20250514',
-      max_tokens: maxTokens,
-      system: systemPrompt,
-      messages: [
-        { role: 'user', content: userMessage }
-      ]
-    })
+    headers: ANTHROPIC_HEADERS,
+    body: JSON.stringify(payload),
+    dispatcher: anthropicAgent
   });
 
   if (!response.ok) {
     const errorText = await response.text();
-    console.error('Anthropic API error:', response.status, errorText);
+    // Error bodies can be large (e.g. echoed HTML from a proxy) - keep log lines bounded
+    console.error('Anthropic API error:', response.status, errorText.slice(0, MAX_LOGGED_ERROR_LENGTH));
     throw new Error(`Anthropic API error: ${response.status}`);
   }
 
-  const data = await response.json();
-  return data.content[0].text;
+  return response;
 }
 
 /**
- * Analyze job-resume match
+ * Text content block marked as a prompt-cache breakpoint.
+ * Anthropic caches the whole prompt prefix up to and including this block
+ * for a few minutes, so later calls sharing that prefix skip reprocessing it.
+ * Prefixes shorter than the model minimum (1024 tokens for Sonnet) are
+ * simply not cached.
  */
-async function analyzeMatch(jobDescription, resumeText) {
-  const systemPrompt = `You are an expert ATS (Applicant Tracking System) analyzer and career coach. Analyze how well a resume matches a job description.
-
-Return a JSON object with this exact structure:
-{
-  "overall_match_score": <number 0-100>,
-  "jobTitle": "<extracted job title>",
-  "companyName": "<extracted company name if found>",
-  "executive_summary": "<2-3 sentence summary of match quality>",
-  "skills_analysis": {
-    "matching_skills": ["<skill1>", "<skill2>", ...],
-    "missing_skills": ["<skill1>", "<skill2>", ...],
-    "transferable_skills": ["<skill that could apply>", ...]
-  },
-  "experience_analysis": {
-    "score": <number 0-100>,
-    "matching_experience": ["<relevant experience point>", ...],
-    "gaps": ["<experience gap>", ...]
-  },
-  "education_analysis": {
-    "score": <number 0-100>,
-    "meets_requirements": <boolean>,
-    "notes": "<any relevant notes>"
-  },
-  "ats_optimization": {
-    "estimated_ats_score": <number 0-100>,
-    "keyword_matches": ["<keyword>", ...],
-    "missing_keywords": ["<keyword>", ...],
-    "formatting_issues": ["<issue>", ...]
-  },
-  "quick_wins": [
-    {
-      "action": "<specific action to take>",
-      "impact": "high|medium|low",
-      "effort": "easy|medium|hard"
+function cacheableText(text) {
+  return { type: 'text', text, cache_control: { type: 'ephemeral' } };
+}
+
+// Inputs are pasted or scraped text; past this size it is almost always page
+// noise, and every extra character is input tokens and latency
+const MAX_INPUT_CHARS = 16000;
+const TRUNCATION_MARKER = '\n...[TRUNCATED]...\n';
+
+/**
+ * Cap a text input, keeping the head (70%) and tail (30%)
+ * The head carries the summary/requirements and the tail the most recent details.
+ * Deterministic, so identical inputs still hit the prompt and response caches.
+ */
+function truncateText(text, maxChars = MAX_INPUT_CHARS) {
+  if (text.length <= maxChars) return text;
+
+  const headLength = Math.floor(maxChars * 0.7);
+  const tailLength = maxChars - headLength;
+  console.warn(`Truncating AI input from ${text.length} to ${maxChars} characters`);
+  return text.slice(0, headLength) + TRUNCATION_MARKER + text.slice(-tailLength);
+}
+
+/**
+ * User message content with the resume first as the cached prefix.
+ * A user typically runs the same resume against many jobs, so the system
+ * prompt + resume prefix is reused while only the trailing part changes.
+ */
+function resumeFirstContent(resumeText, instructions) {
+  return [
+    cacheableText(`=== RESUME ===\n${resumeText}`),
+    { type: 'text', text: instructions }
+  ];
+}
+
+/**
+ * Raised when a forced tool call comes back unusable: cut off before the
+ * tool input was finished, or missing the tool_use block or required fields.
+ * The API does not enforce input_schema, so callers catch this to fall back.
+ */
+class ToolOutputError extends Error {
+  constructor(message, stopReason) {
+    super(message);
+    this.name = 'ToolOutputError';
+    this.stopReason = stopReason;
+  }
+}
+
+/**
+ * Check a tool reply is complete before handing it to callers
+ */
+function checkToolInput(tool, input, stopReason) {
+  if (stopReason !== 'tool_use') {
+    throw new ToolOutputError(`${tool.name} did not complete (stop_reason: ${stopReason})`, stopReason);
+  }
+  if (!input || typeof input !== 'object') {
+    throw new ToolOutputError(`${tool.name} returned no input`, stopReason);
+  }
+  const missing = tool.input_schema.required.filter(key => input[key] === undefined);
+  if (missing.length > 0) {
+    throw new ToolOutputError(`${tool.name} is missing ${missing.join(', ')}`, stopReason);
+  }
+  return input;
+}
+
+// Exact-match cache of responses for callers that opt in with { cache: true }
+const responseCache = new LRUCache({ maxSize: 1000, ttlMs: 6 * 60 * 60 * 1000 });
+
+/**
+ * Build a Messages API payload
+ * With a tool, Claude is forced to call it, so the reply is the tool input:
+ * a JSON object shaped by the tool's input_schema. The API does not enforce
+ * the schema, so callAnthropic checks the result before returning it.
+ */
+function buildMessagesPayload(systemPrompt, userMessage, maxTokens, { model = 'smart', tool } = {}) {
+  return {
+    model: MODELS[model],
+    max_tokens: maxTokens,
+    system: systemPrompt,
+    messages: [
+      { role: 'user', content: userMessage }
+    ],
+    ...(tool && { tools: [tool], tool_choice: { type: 'tool', name: tool.name } })
+  };
+}
+
+/**
+ * Make a request to Anthropic API
+ * systemPrompt and userMessage may be plain strings or arrays of content blocks.
+ * Pass { tool } to get structured output: the call returns the tool input object
+ * instead of text, or throws ToolOutputError if the reply is incomplete.
+ * Pass { cache: true } for calls where an identical prompt should reuse the
+ * previous answer instead of asking the model again.
+ * Pass { onText } to stream the response; it is called with each chunk and
+ * the text so far, and the full result is still returned at the end.
+ * Pass { model: 'fast' } to use the cheaper model tier.
+ */
+async function callAnthropic(systemPrompt, userMessage, maxTokens = 4096, { cache = false, onText, model = 'smart', tool } = {}) {
+  const cacheKey = cache
+    ? hashText(MODELS[model], JSON.stringify(tool), JSON.stringify(systemPrompt), JSON.stringify(userMessage), String(maxTokens))
+    : null;
+
+  if (cacheKey) {
+    const cached = responseCache.get(cacheKey);
+    // Tool results are objects callers may modify, so hand out copies
+    if (cached !== undefined) return tool ? structuredClone(cached) : cached;
+  }
+
+  let result;
+  if (onText) {
+    const stream = streamAnthropic(systemPrompt, userMessage, maxTokens, { model, tool });
+    let text = '';
+    let step;
+    try {
+      while (!(step = await stream.next()).done) {
+        text += step.value;
+        onText(step.value, text);
+      }
+    } catch (e) {
+      // Close the stream so its finally block frees the request slot
+      await stream.return();
+      throw e;
+    }
+    if (tool) {
+      // Only a completed tool call is worth parsing; anything else is reported by its stop reason
+      let input = null;
+      if (step.value === 'tool_use') {
+        try {
+          input = JSON.parse(text);
+        } catch (e) {
+          throw new ToolOutputError(`${tool.name} returned malformed input`, step.value);
+        }
+      }
+      result = checkToolInput(tool, input, step.value);
+    } else {
+      result = text;
+    }
+  } else {
+    await acquireSlot();
+    try {
+      const response = await postMessages(buildMessagesPayload(systemPrompt, userMessage, maxTokens, { model, tool }));
+      const data = await response.json();
+      recordCacheUsage(data.usage);
+      result = tool
+        ? checkToolInput(tool, data.content?.find(block => block.type === 'tool_use')?.input, data.stop_reason)
+        : data.content[0].text;
+    } finally {
+      releaseSlot();
     }
-  ],
-  "detailed_recommendations": [
-    "<specific recommendation 1>",
-    "<specific recommendation 2>"
-  ]
+  }
+
+  if (cacheKey) responseCache.set(cacheKey, tool ? structuredClone(result) : result);
+  return result;
+}
+
+// Payload of the data field in a server-sent event frame
+const SSE_DATA_LINE = /^data: (.*)$/m;
+
+/**
+ * Stream a response from Anthropic API
+ * Yields text chunks as Claude emits them (server-sent events).
+ * With { tool }, yields the tool input JSON as it is generated instead.
+ * Returns the stop reason once the stream ends.
+ */
+async function* streamAnthropic(systemPrompt, userMessage, maxTokens = 4096, { model = 'smart', tool } = {}) {
+  await acquireSlot();
+  try {
+    const response = await postMessages({
+      ...buildMessagesPayload(systemPrompt, userMessage, maxTokens, { model, tool }),
+      stream: true
+    });
+
+    const decoder = new TextDecoder();
+    let buffer = '';
+    let stopReason = null;
+
+    for await (const chunk of response.body) {
+      buffer += decoder.decode(chunk, { stream: true });
+
+      // SSE frames are separated by a blank line. Walk them by offset and
+      // drop the consumed prefix once, rather than re-slicing per frame.
+      let frameStart = 0;
+      let boundary;
+      while ((boundary = buffer.indexOf('\n\n', frameStart)) !== -1) {
+        const frame = buffer.slice(frameStart, boundary);
+        frameStart = boundary + 2;
+
+        const dataField = SSE_DATA_LINE.exec(frame);
+        if (!dataField) continue;
+
+        const event = JSON.parse(dataField[1]);
+        if (event.type === 'content_block_delta' && event.delta?.type === 'text_delta') {
+          yield event.delta.text;
+        } else if (event.type === 'content_block_delta' && event.delta?.type === 'input_json_delta') {
+          yield event.delta.partial_json;
+        } else if (event.type === 'message_start') {
+          recordCacheUsage(event.message?.usage);
+        } else if (event.type === 'message_delta') {
+          stopReason = event.delta?.stop_reason ?? stopReason;
+        } else if (event.type === 'error') {
+          console.error('Anthropic stream error:', event.error);
+          throw new Error(`Anthropic API error: ${event.error?.type || 'stream_error'}`);
+        }
+      }
+      buffer = buffer.slice(frameStart);
+    }
+    return stopReason;
+  } finally {
+    releaseSlot();
+  }
 }
 
-IMPORTANT: Return ONLY valid JSON, no markdown formatting, no code blocks, no extra text.`;
+// JSON Schema building blocks for structured-output tools
+function stringList(description) {
+  return { type: 'array', items: { type: 'string' }, description };
+}
 
-  const userMessage = `Analyze this job posting and resume match:
+function scoreField(description) {
+  return { type: 'number', minimum: 0, maximum: 100, description };
+}
+
+function objectSchema(properties) {
+  return { type: 'object', properties, required: Object.keys(properties) };
+}
+
+const MATCH_ANALYSIS_SCHEMA = objectSchema({
+  overall_match_score: scoreField('Overall match quality, 0-100'),
+  jobTitle: { type: 'string', description: 'Job title extracted from the posting' },
+  companyName: { type: 'string', description: 'Company name from the posting, or empty if not found' },
+  executive_summary: { type: 'string', description: '2-3 sentence summary of match quality' },
+  skills_analysis: objectSchema({
+    matching_skills: stringList('Skills the resume shows that the job asks for'),
+    missing_skills: stringList('Required skills not evident in the resume'),
+    transferable_skills: stringList('Skills that could apply to the role')
+  }),
+  experience_analysis: objectSchema({
+    score: scoreField('Experience fit, 0-100'),
+    matching_experience: stringList('Relevant experience points'),
+    gaps: stringList('Experience gaps')
+  }),
+  education_analysis: objectSchema({
+    score: scoreField('Education fit, 0-100'),
+    meets_requirements: { type: 'boolean' },
+    notes: { type: 'string', description: 'Any relevant notes' }
+  }),
+  ats_optimization: objectSchema({
+    estimated_ats_score: scoreField('Estimated ATS score, 0-100'),
+    keyword_matches: stringList('Job keywords present in the resume'),
+    missing_keywords: stringList('Job keywords missing from the resume'),
+    formatting_issues: stringList('Resume formatting problems for ATS parsing')
+  }),
+  quick_wins: {
+    type: 'array',
+    items: objectSchema({
+      action: { type: 'string', description: 'Specific action to take' },
+      impact: { type: 'string', enum: ['high', 'medium', 'low'] },
+      effort: { type: 'string', enum: ['easy', 'medium', 'hard'] }
+    })
+  },
+  detailed_recommendations: stringList('Specific recommendations')
+});
+
+const MATCH_ANALYSIS_TOOL = {
+  name: 'record_match_analysis',
+  description: 'Record the analysis of how well the resume matches the job description.',
+  input_schema: MATCH_ANALYSIS_SCHEMA
+};
+
+const MATCH_ANALYSIS_PROMPT = `You are an expert ATS (Applicant Tracking System) analyzer and career coach. Analyze how well a resume matches a job description, then record your analysis with the record_match_analysis tool.`;
+
+// Users frequently re-submit the same job/resume pair (e.g. from the extension),
+// so keep recent analyses keyed by a digest of both inputs
+const analysisCache = new LRUCache({ maxSize: 512, ttlMs: 60 * 60 * 1000 });
+const MIN_CACHEABLE_LENGTH = 50;
+
+// Every key includes ANALYSIS_CACHE_VERSION (defined with the combined
+// analysis/cover letter tool below, since both calls fill this cache)
+function getAnalysisCacheKey(jobDescription, resumeText) {
+  // Surrounding whitespace varies between re-scrapes of the same page and doesn't change the analysis
+  const job = jobDescription.trim();
+  const resume = resumeText.trim();
+  return job.length >= MIN_CACHEABLE_LENGTH && resume.length >= MIN_CACHEABLE_LENGTH
+    ? hashText(ANALYSIS_CACHE_VERSION, job, resume)
+    : null;
+}
+
+// overall_match_score is the first key of the analysis schema, so it shows up
+// early in a streamed response. Require a terminator so "7" isn't read from "78".
+const MATCH_SCORE_RE = /"overall_match_score"\s*:\s*(\d+(?:\.\d+)?)\s*[,}\n]/;
+
+/**
+ * Build an onText handler that reports the match score once it has streamed in
+ */
+function watchForScore(onScore) {
+  if (!onScore) return undefined;
+  let reported = false;
+  return (chunk, text) => {
+    if (reported) return;
+    const match = MATCH_SCORE_RE.exec(text);
+    if (match) {
+      reported = true;
+      onScore(Number(match[1]));
+    }
+  };
+}
+
+/**
+ * User message for a match analysis, shared by analyzeMatch and scoreMatch
+ */
+function matchAnalysisContent(jobDescription, resumeText) {
+  return resumeFirstContent(truncateText(resumeText), `Analyze how well the resume above matches this job posting:
 
 === JOB DESCRIPTION ===
-${jobDescription}
+${truncateText(jobDescription)}
 
-=== RESUME ===
-${resumeText}
+Provide a comprehensive analysis.`);
+}
+
+/**
+ * Analyze job-resume match
+ * Pass { onScore } to be told the overall score before the full analysis arrives
+ */
+async function analyzeMatch(jobDescription, resumeText, { onScore } = {}) {
+  const cacheKey = getAnalysisCacheKey(jobDescription, resumeText);
+
+  if (cacheKey) {
+    const cached = analysisCache.get(cacheKey);
+    // Callers annotate the result, so never hand out the cached object itself
+    if (cached) {
+      onScore?.(cached.overall_match_score);
+      return structuredClone(cached);
+    }
+  }
 
-Provide a comprehensive analysis as JSON.`;
+  const userMessage = matchAnalysisContent(jobDescription, resumeText);
 
-  const response = await callAnthropic(systemPrompt, userMessage);
-  
+  let result;
   try {
-    // Try to parse JSON, handling potential markdown code blocks
-    let jsonStr = response.trim();
-    if (jsonStr.startsWith('```')) {
-      jsonStr = jsonStr.replace(/```json?\n?/g, '').replace(/```$/g, '').trim();
-    }
-    return JSON.parse(jsonStr);
+    result = await callAnthropic(MATCH_ANALYSIS_PROMPT, userMessage, 4096, {
+      tool: MATCH_ANALYSIS_TOOL,
+      onText: watchForScore(onScore)
+    });
   } catch (e) {
-    console.error('Failed to parse AI response:', e);
-    // Return a basic structure if parsing fails
+    if (!(e instanceof ToolOutputError)) throw e;
+    console.error('Incomplete match analysis:', e.message);
+    // Return a basic structure; fallbacks are not cached so a retry can succeed
     return {
       overall_match_score: 50,
-      executive_summary: response.substring(0, 500),
+      executive_summary: 'The analysis could not be completed. Please try again.',
       skills_analysis: { matching_skills: [], missing_skills: [] },
       ats_optimization: { estimated_ats_score: 50 },
       quick_wins: [],
       detailed_recommendations: []
     };
   }
+
+  if (cacheKey) analysisCache.set(cacheKey, structuredClone(result));
+  return result;
 }
 
+// The analysis tool cut down to the two scores. It keeps the same name and
+// score definitions, so MATCH_ANALYSIS_PROMPT's rubric applies unchanged.
+const MATCH_SCORE_TOOL = {
+  ...MATCH_ANALYSIS_TOOL,
+  input_schema: objectSchema({
+    overall_match_score: MATCH_ANALYSIS_SCHEMA.properties.overall_match_score,
+    ats_optimization: objectSchema({
+      estimated_ats_score: MATCH_ANALYSIS_SCHEMA.properties.ats_optimization.properties.estimated_ats_score
+    })
+  })
+};
+
 /**
- * Generate tailored resume
+ * Score a job-resume match without the full analysis
+ * For callers that only need the numbers (e.g. re-scoring a tailored resume).
+ * Uses the same prompt and message as analyzeMatch so the scores are comparable,
+ * but Claude writes two fields instead of the whole analysis.
  */
-async function generateTailoredResume(jobDescription, resumeText, selectedSkills = [], quickWins = []) {
-  const systemPrompt = `You are an expert resume writer and ATS optimization specialist.
+async function scoreMatch(jobDescription, resumeText) {
+  const cacheKey = getAnalysisCacheKey(jobDescription, resumeText);
+  const cached = cacheKey && analysisCache.get(cacheKey);
+  if (cached) {
+    return {
+      overall_match_score: cached.overall_match_score,
+      estimated_ats_score: cached.ats_optimization?.estimated_ats_score
+    };
+  }
+
+  const userMessage = matchAnalysisContent(jobDescription, resumeText);
+
+  try {
+    const scores = await callAnthropic(MATCH_ANALYSIS_PROMPT, userMessage, 256, { cache: true, tool: MATCH_SCORE_TOOL });
+    return {
+      overall_match_score: scores.overall_match_score,
+      estimated_ats_score: scores.ats_optimization?.estimated_ats_score ?? null
+    };
+  } catch (e) {
+    if (!(e instanceof ToolOutputError)) throw e;
+    console.error('Incomplete match scores:', e.message);
+    return { overall_match_score: null, estimated_ats_score: null };
+  }
+}
+
+const TAILORED_RESUME_PROMPT = `You are an expert resume writer and ATS optimization specialist.
 Your task is to improve a resume to better match a specific job description.
 
 Guidelines:
@@ -140,60 +538,59 @@ CRITICAL RULES - WORK EXPERIENCE:
 - If the original resume has 3 jobs, the tailored resume MUST also have exactly 3 separate jobs
 - Preserve the exact number of work experience entries from the original resume
 
-Return a JSON object with:
-{
-  "resumeText": "<the improved resume text>",
-  "changes": [
-    "<description of change 1>",
-    "<description of change 2>"
-  ]
-}
+Record the result with the record_tailored_resume tool.`;
 
-IMPORTANT: Return ONLY valid JSON, no markdown formatting.`;
+const TAILORED_RESUME_TOOL = {
+  name: 'record_tailored_resume',
+  description: 'Record the improved resume and a summary of what changed.',
+  input_schema: objectSchema({
+    resumeText: { type: 'string', description: 'The full improved resume text' },
+    changes: stringList('Description of each change made')
+  })
+};
 
-  const userMessage = `Improve this resume to better match the job:
+/**
+ * Generate tailored resume
+ */
+async function generateTailoredResume(jobDescription, resumeText, selectedSkills = [], quickWins = []) {
+  const userMessage = resumeFirstContent(resumeText, `Improve the resume above to better match the job:
 
 === JOB DESCRIPTION ===
-${jobDescription}
-
-=== ORIGINAL RESUME ===
-${resumeText}
+${truncateText(jobDescription)}
 
 ${selectedSkills.length > 0 ? `=== SKILLS TO EMPHASIZE ===\n${selectedSkills.join(', ')}` : ''}
 
 ${quickWins.length > 0 ? `=== QUICK WINS TO APPLY ===\n${quickWins.join('\n')}` : ''}
 
-Generate an improved version that will score higher with ATS systems.`;
+Generate an improved version that will score higher with ATS systems.`);
 
-  const response = await callAnthropic(systemPrompt, userMessage);
-  
   try {
-    let jsonStr = response.trim();
-    if (jsonStr.startsWith('```')) {
-      jsonStr = jsonStr.replace(/```json?\n?/g, '').replace(/```$/g, '').trim();
-    }
-    return JSON.parse(jsonStr);
+    return await callAnthropic(TAILORED_RESUME_PROMPT, userMessage, 4096, { tool: TAILORED_RESUME_TOOL });
   } catch (e) {
-    console.error('Failed to parse tailored resume:', e);
+    if (!(e instanceof ToolOutputError)) throw e;
+    console.error('Failed to generate tailored resume:', e.message);
     return {
-      resumeText: response,
-      changes: ['Unable to parse specific changes']
+      resumeText,
+      changes: ['Unable to tailor the resume. Please try again.']
     };
   }
 }
 
+const TONE_INSTRUCTIONS = {
+  professional: 'Write in a professional, polished tone suitable for corporate environments.',
+  friendly: 'Write in a warm, approachable tone while maintaining professionalism.',
+  confident: 'Write with confidence and assertiveness, highlighting achievements boldly.',
+  enthusiastic: 'Write with genuine enthusiasm and energy about the opportunity.'
+};
+
 /**
- * Generate cover letter
+ * Build a lookup of system prompts, one per tone, at load time
+ * Unknown tones fall back to the professional prompt
  */
-async function generateCoverLetter(jobDescription, resumeText, companyName = '', tone = 'professional') {
-  const toneInstructions = {
-    professional: 'Write in a professional, polished tone suitable for corporate environments.',
-    friendly: 'Write in a warm, approachable tone while maintaining professionalism.',
-    confident: 'Write with confidence and assertiveness, highlighting achievements boldly.',
-    enthusiastic: 'Write with genuine enthusiasm and energy about the opportunity.'
-  };
-
-  const systemPrompt = `You are an expert cover letter writer. Create a compelling, personalized cover letter that:
+function promptsByTone(buildPrompt) {
+  const prompts = {};
+  for (const [tone, instruction] of Object.entries(TONE_INSTRUCTIONS)) {
+    prompts[tone] = buildPrompt(`Create a compelling, personalized cover letter that:
 1. Opens with a strong hook
 2. Connects the candidate's experience to the job requirements
 3. Shows genuine interest in the company/role
@@ -201,25 +598,133 @@ async function generateCoverLetter(jobDescription, resumeText, companyName = '',
 5. Ends with a clear call to action
 6. Is 3-4 paragraphs, approximately 300-400 words
 
-${toneInstructions[tone] || toneInstructions.professional}
+${instruction}`);
+  }
+  return (tone) => prompts[tone] || prompts.professional;
+}
 
-Return ONLY the cover letter text, no JSON, no formatting markers.`;
+const coverLetterPrompt = promptsByTone(guidelines => `You are an expert cover letter writer. ${guidelines}
 
-  const userMessage = `Write a cover letter for this job application:
+Return ONLY the cover letter text, no JSON, no formatting markers.`);
 
-=== JOB DESCRIPTION ===
-${jobDescription}
+const analysisWithCoverLetterPrompt = promptsByTone(guidelines => `You are an expert ATS (Applicant Tracking System) analyzer, career coach, and cover letter writer. Analyze how well a resume matches a job description, then write a cover letter for the same application.
+
+For the cover letter: ${guidelines}
+
+Record both with the record_analysis_and_cover_letter tool.`);
+
+/**
+ * Build cover letter prompts (shared by buffered and streaming generation)
+ */
+function buildCoverLetterPrompts(jobDescription, resumeText, companyName, tone) {
+  const systemPrompt = coverLetterPrompt(tone);
+
+  const userMessage = resumeFirstContent(truncateText(resumeText), `Write a cover letter for the candidate above for this job application:
 
-=== CANDIDATE'S RESUME ===
-${resumeText}
+=== JOB DESCRIPTION ===
+${truncateText(jobDescription)}
 
 ${companyName ? `=== COMPANY NAME ===\n${companyName}` : ''}
 
-Create a compelling cover letter that will grab the hiring manager's attention.`;
+Create a compelling cover letter that will grab the hiring manager's attention.`);
 
+  return { systemPrompt, userMessage };
+}
+
+/**
+ * Generate cover letter
+ */
+async function generateCoverLetter(jobDescription, resumeText, companyName = '', tone = 'professional') {
+  const { systemPrompt, userMessage } = buildCoverLetterPrompts(jobDescription, resumeText, companyName, tone);
   return await callAnthropic(systemPrompt, userMessage, 2048);
 }
 
+/**
+ * Stream cover letter text as it is generated
+ */
+function streamCoverLetter(jobDescription, resumeText, companyName = '', tone = 'professional') {
+  const { systemPrompt, userMessage } = buildCoverLetterPrompts(jobDescription, resumeText, companyName, tone);
+  return streamAnthropic(systemPrompt, userMessage, 2048);
+}
+
+const ANALYSIS_WITH_COVER_LETTER_TOOL = {
+  name: 'record_analysis_and_cover_letter',
+  description: 'Record the match analysis and the cover letter for the same application.',
+  input_schema: objectSchema({
+    analysis: MATCH_ANALYSIS_SCHEMA,
+    cover_letter: { type: 'string', description: 'The full cover letter text, paragraphs separated by blank lines' }
+  })
+};
+
+// analyzeMatch and analyzeMatchWithCoverLetter both write to analysisCache, so a
+// change to the model or to either call's prompts or schema must not serve
+// analyses produced by the old ones
+const ANALYSIS_CACHE_VERSION = hashText(
+  MODELS.smart,
+  MATCH_ANALYSIS_PROMPT,
+  JSON.stringify(MATCH_ANALYSIS_SCHEMA),
+  ...Object.keys(TONE_INSTRUCTIONS).map(analysisWithCoverLetterPrompt),
+  JSON.stringify(ANALYSIS_WITH_COVER_LETTER_TOOL.input_schema)
+);
+
+/**
+ * Analyze job-resume match and write a cover letter in a single Claude call
+ * Saves a full round-trip when the caller needs both
+ */
+async function analyzeMatchWithCoverLetter(jobDescription, resumeText, companyName = '', tone = 'professional', { onScore } = {}) {
+  const cacheKey = getAnalysisCacheKey(jobDescription, resumeText);
+  const cached = cacheKey && analysisCache.get(cacheKey);
+
+  // Analysis already known - only the cover letter needs generating
+  if (cached) {
+    onScore?.(cached.overall_match_score);
+    const coverLetter = await generateCoverLetter(jobDescription, resumeText, companyName, tone);
+    return { analysis: structuredClone(cached), coverLetter };
+  }
+
+  const systemPrompt = analysisWithCoverLetterPrompt(tone);
+
+  const userMessage = resumeFirstContent(truncateText(resumeText), `Analyze how well the resume above matches this job posting, then write the cover letter:
+
+=== JOB DESCRIPTION ===
+${truncateText(jobDescription)}
+
+${companyName ? `=== COMPANY NAME ===\n${companyName}` : ''}
+
+Provide the analysis and cover letter.`);
+
+  // The score may stream in before the combined call fails; report it only once
+  let scoreReported = false;
+  const reportScore = onScore && (score => {
+    scoreReported = true;
+    onScore(score);
+  });
+
+  let result;
+  try {
+    result = await callAnthropic(systemPrompt, userMessage, 6144, {
+      tool: ANALYSIS_WITH_COVER_LETTER_TOOL,
+      onText: watchForScore(reportScore)
+    });
+  } catch (e) {
+    // Output cut off at max_tokens leaves incomplete tool JSON - retry as two smaller calls
+    if (!(e instanceof ToolOutputError)) throw e;
+    result = null;
+  }
+
+  if (!result?.analysis || !result.cover_letter) {
+    console.error('Incomplete combined analysis/cover letter, falling back to separate calls');
+    const [analysis, coverLetter] = await Promise.all([
+      analyzeMatch(jobDescription, resumeText, { onScore: scoreReported ? undefined : onScore }),
+      generateCoverLetter(jobDescription, resumeText, companyName, tone)
+    ]);
+    return { analysis, coverLetter };
+  }
+
+  if (cacheKey) analysisCache.set(cacheKey, structuredClone(result.analysis));
+  return { analysis: result.analysis, coverLetter: result.cover_letter };
+}
+
 /**
  * Build resume from conversation (for guided builder)
  */
@@ -237,7 +742,7 @@ Return the resume as plain text with clear section headers.`;
 
   const userMessage = `Create a professional resume from this data:
 
-${JSON.stringify(collectedData, null, 2)}
+${JSON.stringify(collectedData)}
 
 Generate a polished, professional resume in plain text format.`;
 
@@ -266,63 +771,95 @@ Description: "${rawDescription}"
 
 Create a polished bullet point.`;
 
-  const response = await callAnthropic(systemPrompt, userMessage, 256);
+  const response = await callAnthropic(systemPrompt, userMessage, 256, { model: 'fast' });
   return response.trim();
 }
 
 /**
- * Match job to resume (for job alerts)
+ * Render the candidate section of a job-match prompt
+ * Alert runs score many jobs for one candidate, so callers can build this
+ * once and pass the string to calculateJobMatches for every batch.
+ */
+function formatCandidateProfile(resumeData) {
+  return `CANDIDATE:
+Skills: ${resumeData.skills?.join(', ') || 'Not specified'}
+Experience: ${resumeData.years_of_experience || 'Unknown'} years
+Target titles: ${resumeData.target_job_titles?.join(', ') || 'Not specified'}`;
+}
+
+const JOB_MATCHES_TOOL = {
+  name: 'record_job_matches',
+  description: 'Record how well each numbered job matches the candidate.',
+  input_schema: objectSchema({
+    matches: {
+      type: 'array',
+      description: 'One entry per job in the list',
+      items: objectSchema({
+        jobNumber: { type: 'integer', description: 'Number of the job in the list' },
+        matchScore: scoreField('Match score, 0-100'),
+        matchedSkills: stringList('Candidate skills the job needs'),
+        matchReason: { type: 'string', description: 'One sentence explaining the match' }
+      })
+    }
+  })
+};
+
+/**
+ * Match several jobs against one candidate in a single call (for job alerts)
+ * Returns one result per job, in input order. Jobs Claude skipped, or a whole
+ * batch whose reply was unusable, get the default score per-job matching used.
+ * Sends the candidate and instructions once per batch instead of once per job.
  */
-async function calculateJobMatch(jobData, resumeData) {
-  const systemPrompt = `You are a job matching algorithm. Quickly assess how well a job matches a candidate's profile.
+async function calculateJobMatches(jobs, resumeData) {
+  const candidateProfile = typeof resumeData === 'string' ? resumeData : formatCandidateProfile(resumeData);
 
-Return ONLY a JSON object:
-{
-  "matchScore": <number 0-100>,
-  "matchedSkills": ["<skill>", ...],
-  "matchReason": "<one sentence explaining the match>"
-}`;
+  const systemPrompt = `You are a job matching algorithm. Quickly assess how well each job matches a candidate's profile and record every job with the record_job_matches tool.`;
 
-  const userMessage = `Rate this job match:
+  const jobList = jobs.map((job, i) => `JOB ${i + 1}:
+Title: ${job.title}
+Company: ${job.company}
+Skills needed: ${job.required_skills?.join(', ') || 'Not specified'}`).join('\n\n');
 
-JOB:
-Title: ${jobData.title}
-Company: ${jobData.company}
-Skills needed: ${jobData.required_skills?.join(', ') || 'Not specified'}
+  const userMessage = `${candidateProfile}
 
-CANDIDATE:
-Skills: ${resumeData.skills?.join(', ') || 'Not specified'}
-Experience: ${resumeData.years_of_experience || 'Unknown'} years
-Target titles: ${resumeData.target_job_titles?.join(', ') || 'Not specified'}`;
+Rate how well each of these jobs matches the candidate:
 
-  const response = await callAnthropic(systemPrompt, userMessage, 512);
-  
+${jobList}`;
+
+  let matches;
   try {
-    let jsonStr = response.trim();
-    if (jsonStr.startsWith('```')) {
-      jsonStr = jsonStr.replace(/```json?\n?/g, '').replace(/```$/g, '').trim();
-    }
-    return JSON.parse(jsonStr);
+    ({ matches } = await callAnthropic(systemPrompt, userMessage, Math.min(512 * jobs.length, 4096), {
+      cache: true,
+      model: 'fast',
+      tool: JOB_MATCHES_TOOL
+    }));
   } catch (e) {
-    return { matchScore: 50, matchedSkills: [], matchReason: 'Unable to calculate match' };
+    if (!(e instanceof ToolOutputError)) throw e;
+    console.error('Failed to score job batch:', e.message);
+    matches = [];
+  }
+
+  const results = new Array(jobs.length).fill(null);
+  for (const { jobNumber, ...match } of matches) {
+    if (jobNumber >= 1 && jobNumber <= jobs.length) results[jobNumber - 1] = match;
   }
+  return results.map(match => match || { matchScore: 50, matchedSkills: [], matchReason: 'Unable to calculate match' });
 }
 
+const JOB_SUGGESTIONS_TOOL = {
+  name: 'record_job_suggestions',
+  description: 'Record suggested resume bullet points and skills for the role.',
+  input_schema: objectSchema({
+    responsibilities: stringList('5-7 achievement-focused bullet points'),
+    skills: stringList('3-5 relevant technical skills')
+  })
+};
+
 /**
  * Generate job experience suggestions
  */
 async function generateJobSuggestions(jobTitle, company, description) {
-  const systemPrompt = `You are an expert resume writer. Generate impactful bullet points for work experience.
-
-Return a JSON object with:
-{
-  "responsibilities": [
-    "Achievement-focused bullet point with metrics...",
-    "Another strong bullet point...",
-    "..."
-  ],
-  "skills": ["skill1", "skill2", "skill3"]
-}
+  const systemPrompt = `You are an expert resume writer. Generate impactful bullet points for work experience and record them with the record_job_suggestions tool.
 
 Guidelines:
 - Start each bullet with a strong action verb
@@ -330,9 +867,7 @@ Guidelines:
 - Focus on achievements, not just duties
 - Keep bullets concise (1-2 lines)
 - Generate 5-7 bullet points in "responsibilities"
-- Extract 3-5 relevant technical skills for "skills"
-
-IMPORTANT: Return ONLY valid JSON, no markdown.`;
+- Extract 3-5 relevant technical skills for "skills"`;
 
   const userMessage = `Generate resume bullet points for:
 Job Title: ${jobTitle}
@@ -341,74 +876,60 @@ ${description ? `Context: ${description}` : ''}
 
 Create impactful, achievement-focused bullet points.`;
 
-  const response = await callAnthropic(systemPrompt, userMessage, 1024);
-  
   try {
-    let jsonStr = response.trim();
-    if (jsonStr.startsWith('```')) {
-      jsonStr = jsonStr.replace(/```json?\n?/g, '').replace(/```$/g, '').trim();
-    }
-    return JSON.parse(jsonStr);
+    return await callAnthropic(systemPrompt, userMessage, 1024, { model: 'fast', tool: JOB_SUGGESTIONS_TOOL });
   } catch (e) {
-    console.error('Failed to parse suggestions:', e);
+    if (!(e instanceof ToolOutputError)) throw e;
+    console.error('Failed to generate suggestions:', e.message);
     return { responsibilities: ['Unable to generate suggestions. Please try again.'], skills: [] };
   }
 }
 
+const BULLET_VARIATIONS_TOOL = {
+  name: 'record_bullet_variations',
+  description: 'Record the alternative versions of the bullet point.',
+  input_schema: objectSchema({
+    variations: stringList('3 versions: metrics focused, impact focused, skills focused')
+  })
+};
+
 /**
  * Generate bullet point variations
  */
 async function generateBulletVariations(description, jobTitle) {
-  const systemPrompt = `You are an expert resume writer. Generate 3 different versions of a resume bullet point.
-
-Return a JSON object:
-{
-  "variations": [
-    "Version 1 - metrics focused...",
-    "Version 2 - impact focused...",
-    "Version 3 - skills focused..."
-  ]
-}
+  const systemPrompt = `You are an expert resume writer. Generate 3 different versions of a resume bullet point and record them with the record_bullet_variations tool.
 
 Each variation should:
 - Start with a different action verb
 - Highlight different aspects
-- Be concise and impactful
-
-IMPORTANT: Return ONLY valid JSON.`;
+- Be concise and impactful`;
 
   const userMessage = `Create 3 variations of this experience:
 ${description}
 ${jobTitle ? `Role: ${jobTitle}` : ''}`;
 
-  const response = await callAnthropic(systemPrompt, userMessage, 512);
-  
   try {
-    let jsonStr = response.trim();
-    if (jsonStr.startsWith('```')) {
-      jsonStr = jsonStr.replace(/```json?\n?/g, '').replace(/```$/g, '').trim();
-    }
-    const result = JSON.parse(jsonStr);
-    return result.variations || [];
+    const result = await callAnthropic(systemPrompt, userMessage, 512, { model: 'fast', tool: BULLET_VARIATIONS_TOOL });
+    return result.variations;
   } catch (e) {
+    if (!(e instanceof ToolOutputError)) throw e;
     return ['Unable to generate variations'];
   }
 }
 
-/**
- * Generate professional summary
- */
-async function generateProfessionalSummary(resumeData, style = 'professional') {
-  const styleInstructions = {
-    professional: 'Write in a polished, corporate tone.',
-    confident: 'Write with confidence and strong assertions.',
-    friendly: 'Write in a warm, approachable tone.',
-    technical: 'Emphasize technical skills and expertise.'
-  };
+const SUMMARY_STYLE_INSTRUCTIONS = {
+  professional: 'Write in a polished, corporate tone.',
+  confident: 'Write with confidence and strong assertions.',
+  friendly: 'Write in a warm, approachable tone.',
+  technical: 'Emphasize technical skills and expertise.'
+};
 
-  const systemPrompt = `You are an expert resume writer. Create a compelling professional summary.
+// One system prompt per summary style, built once
+const SUMMARY_PROMPTS = {};
+for (const [style, instruction] of Object.entries(SUMMARY_STYLE_INSTRUCTIONS)) {
+  SUMMARY_PROMPTS[style] = `You are an expert resume writer. Create a compelling professional summary.
 
-${styleInstructions[style] || styleInstructions.professional}
+${instruction}
 
 Guidelines:
 - 2-3 sentences maximum
@@ -417,21 +938,36 @@ Guidelines:
 - Tailor to the target role if provided
 
 Return ONLY the summary text, no JSON or formatting.`;
+}
+
+/**
+ * Generate professional summary
+ */
+async function generateProfessionalSummary(resumeData, style = 'professional') {
+  const systemPrompt = SUMMARY_PROMPTS[style] || SUMMARY_PROMPTS.professional;
 
   const userMessage = `Create a professional summary for:
-${JSON.stringify(resumeData, null, 2)}`;
+${JSON.stringify(resumeData)}`;
 
-  return await callAnthropic(systemPrompt, userMessage, 256);
+  return await callAnthropic(systemPrompt, userMessage, 256, { model: 'fast' });
 }
 
 module.exports = {
+  ToolOutputError,
   callAnthropic,
+  streamAnthropic,
+  getConcurrencyStats,
+  closeAnthropicClient,
   analyzeMatch,
+  analyzeMatchWithCoverLetter,
+  scoreMatch,
   generateTailoredResume,
   generateCoverLetter,
+  streamCoverLetter,
   buildResumeFromData,
   generateBulletPoint,
-  calculateJobMatch,
+  calculateJobMatches,
+  formatCandidateProfile,
   generateJobSuggestions,
   generateBulletVariations,
   generateProfessionalSummary
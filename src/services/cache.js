@@ -0,0 +1,66 @@
+/**
+ * In-Memory Cache Service
+ * Bounded LRU cache with per-entry TTL for memoizing expensive AI results
+ */
+
+const crypto = require('crypto');
+
+class LRUCache {
+  constructor({ maxSize = 500, ttlMs = 60 * 60 * 1000 } = {}) {
+    this.maxSize = maxSize;
+    this.ttlMs = ttlMs;
+    // Map preserves insertion order, so the first key is always the least recently used
+    this.entries = new Map();
+  }
+
+  /**
+   * Get a value, or undefined if missing/expired
+   */
+  get(key) {
+    const entry = this.entries.get(key);
+    if (!entry) return undefined;
+
+    if (entry.expiresAt <= Date.now()) {
+      this.entries.delete(key);
+      return undefined;
+    }
+
+    // Move to the most-recently-used position
+    this.entries.delete(key);
+    this.entries.set(key, entry);
+    return entry.value;
+  }
+
+  /**
+   * Store a value, evicting the least recently used entry when full
+   */
+  set(key, value) {
+    this.entries.delete(key);
+    this.entries.set(key, { value, expiresAt: Date.now() + this.ttlMs });
+
+    if (this.entries.size > this.maxSize) {
+      this.entries.delete(this.entries.keys().next().value);
+    }
+  }
+
+  get size() {
+    return this.entries.size;
+  }
+}
+
+/**
+ * Fixed-size digest of one or more text inputs, for use as a cache key
+ */
+function hashText(...parts) {
+  const hash = crypto.createHash('sha256');
+  for (const part of parts) {
+    hash.update(part || '');
+    hash.update('\0');
+  }
+  return hash.digest('hex');
+}
+
+module.exports = {
+  LRUCache,
+  hashText
+};
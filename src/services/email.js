@@ -4,6 +4,21 @@
 
 const nodemailer = require('nodemailer');
 
+// HTML escaping in a single regex pass with a lookup table
+const HTML_ESCAPES = {
+  '&': '&amp;',
+  '<': '&lt;',
+  '>': '&gt;',
+  '"': '&quot;',
+  "'": '&#39;'
+};
+const HTML_ESCAPE_RE = /[&<>"']/g;
+
+function escapeHtml(value) {
+  if (value === null || value === undefined) return '';
+  return String(value).replace(HTML_ESCAPE_RE, ch => HTML_ESCAPES[ch]);
+}
+
 // Create transporter
 let transporter = null;
 
@@ -53,10 +68,10 @@ async function sendJobAlertEmail(userEmail, userName, jobs) {
   const jobListHtml = jobs.map(job => `
     <div style="border: 1px solid #e0e0e0; border-radius: 8px; padding: 16px; margin-bottom: 16px;">
       <h3 style="margin: 0 0 8px 0; color: #1a1a1a;">
-        <a href="${job.apply_url}" style="color: #6366F1; text-decoration: none;">${job.title}</a>
+        <a href="${escapeHtml(job.apply_url)}" style="color: #6366F1; text-decoration: none;">${escapeHtml(job.title)}</a>
       </h3>
       <p style="margin: 0 0 8px 0; color: #666;">
-        ${job.company} • ${job.location}
+        ${escapeHtml(job.company)} • ${escapeHtml(job.location)}
         ${job.salary_min ? ` • $${(job.salary_min / 1000).toFixed(0)}k - $${(job.salary_max / 1000).toFixed(0)}k` : ''}
       </p>
       <p style="margin: 0; color: #4CAF50; font-weight: bold;">
@@ -78,7 +93,7 @@ async function sendJobAlertEmail(userEmail, userName, jobs) {
         <p style="color: #666; margin: 8px 0 0 0;">Your Daily Job Matches</p>
       </div>
       
-      <p>Hi ${userName || 'there'}! 👋</p>
+      <p>Hi ${escapeHtml(userName) || 'there'}! 👋</p>
       
       <p>We found <strong>${jobs.length} new job${jobs.length !== 1 ? 's' : ''}</strong> that match your profile:</p>
       
@@ -124,7 +139,7 @@ async function sendWelcomeEmail(userEmail, userName) {
         <h1 style="color: #6366F1; margin: 0;">🎉 Welcome to JobMatch AI!</h1>
       </div>
       
-      <p>Hi ${userName || 'there'}! 👋</p>
+      <p>Hi ${escapeHtml(userName) || 'there'}! 👋</p>
       
       <p>Thanks for joining JobMatch AI. We're here to help you land your dream job faster.</p>
       
@@ -181,7 +196,7 @@ async function sendSubscriptionEmail(userEmail, userName, planType) {
         <h1 style="color: #6366F1; margin: 0;">🚀 You're Now Pro!</h1>
       </div>
       
-      <p>Hi ${userName || 'there'}! 👋</p>
+      <p>Hi ${escapeHtml(userName) || 'there'}! 👋</p>
       
       <p>Thank you for upgrading to <strong>${plan.name}</strong> (${plan.price})!</p>
       
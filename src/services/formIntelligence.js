@@ -5,6 +5,197 @@
 
 const { query } = require('../db');
 
+// ATS URL fragments in priority order; the first fragment found in the URL wins
+const PLATFORM_HOSTS = [
+  ['greenhouse.io', 'greenhouse'],
+  ['lever.co', 'lever'],
+  ['myworkdayjobs.com', 'workday'],
+  ['workday.com', 'workday'],
+  ['linkedin.com/jobs/apply', 'linkedin_easy'],
+  ['indeed.com', 'indeed'],
+  ['glassdoor.com', 'glassdoor'],
+  ['smartrecruiters.com', 'smartrecruiters'],
+  ['icims.com', 'icims'],
+  ['bamboohr.com', 'bamboohr'],
+  ['jobvite.com', 'jobvite'],
+  ['taleo.net', 'taleo']
+];
+
+// Form complexity per platform, flattened into a reverse index for O(1) lookup
+const FORM_TYPES = {
+  easy: ['linkedin_easy', 'indeed'],
+  standard: ['greenhouse', 'lever', 'smartrecruiters', 'bamboohr'],
+  complex: ['workday', 'taleo', 'icims', 'jobvite']
+};
+
+const FORM_TYPE_BY_PLATFORM = new Map(
+  Object.entries(FORM_TYPES).flatMap(([formType, platforms]) =>
+    platforms.map(platform => [platform, formType])
+  )
+);
+
+// Built-in field selectors per platform, shared by every pattern lookup
+const DEFAULT_FIELD_PATTERNS = {
+  greenhouse: {
+    firstName: {
+      selectors: ['#first_name', 'input[name="first_name"]', 'input[id*="first"]'],
+      type: 'text',
+      required: true
+    },
+    lastName: {
+      selectors: ['#last_name', 'input[name="last_name"]', 'input[id*="last"]'],
+      type: 'text',
+      required: true
+    },
+    email: {
+      selectors: ['#email', 'input[name="email"]', 'input[type="email"]'],
+      type: 'email',
+      required: true
+    },
+    phone: {
+      selectors: ['#phone', 'input[name="phone"]', 'input[type="tel"]'],
+      type: 'tel',
+      required: false
+    },
+    resume: {
+      selectors: ['#resume', 'input[name="resume"]', 'input[type="file"]'],
+      type: 'file',
+      required: true
+    },
+    coverLetter: {
+      selectors: ['#cover_letter', 'input[name="cover_letter"]'],
+      type: 'file',
+      required: false
+    },
+    linkedIn: {
+      selectors: ['input[name*="linkedin"]', 'input[placeholder*="LinkedIn"]'],
+      type: 'url',
+      required: false
+    }
+  },
+  
+  lever: {
+    name: {
+      selectors: ['input[name="name"]', '#name'],
+      type: 'text',
+      required: true
+    },
+    email: {
+      selectors: ['input[name="email"]', 'input[type="email"]'],
+      type: 'email',
+      required: true
+    },
+    phone: {
+      selectors: ['input[name="phone"]', 'input[type="tel"]'],
+      type: 'tel',
+      required: false
+    },
+    resume: {
+      selectors: ['input[name="resume"]', 'input[type="file"]'],
+      type: 'file',
+      required: true
+    }
+  },
+  
+  workday: {
+    firstName: {
+      selectors: ['input[data-automation-id*="firstName"]'],
+      type: 'text',
+      required: true
+    },
+    lastName: {
+      selectors: ['input[data-automation-id*="lastName"]'],
+      type: 'text',
+      required: true
+    },
+    email: {
+      selectors: ['input[data-automation-id*="email"]'],
+      type: 'email',
+      required: true
+    },
+    phone: {
+      selectors: ['input[data-automation-id*="phone"]'],
+      type: 'tel',
+      required: false
+    }
+  },
+  
+  linkedin_easy: {
+    phone: {
+      selectors: ['#single-line-text-form-component-phoneNumber'],
+      type: 'tel',
+      required: true
+    }
+  },
+  
+  indeed: {
+    name: {
+      selectors: ['#applicant.name', 'input[name="applicant.name"]'],
+      type: 'text',
+      required: true
+    },
+    phone: {
+      selectors: ['#applicant.phoneNumber', 'input[name="applicant.phoneNumber"]'],
+      type: 'tel',
+      required: true
+    },
+    email: {
+      selectors: ['#applicant.email', 'input[name="applicant.email"]'],
+      type: 'email',
+      required: true
+    }
+  },
+  
+  custom: {
+    // Generic patterns that work for most forms
+    firstName: {
+      selectors: [
+        'input[name*="first"]',
+        'input[id*="first"]',
+        'input[placeholder*="First"]'
+      ],
+      type: 'text',
+      required: true
+    },
+    lastName: {
+      selectors: [
+        'input[name*="last"]',
+        'input[id*="last"]',
+        'input[placeholder*="Last"]'
+      ],
+      type: 'text',
+      required: true
+    },
+    email: {
+      selectors: [
+        'input[type="email"]',
+        'input[name*="email"]',
+        'input[id*="email"]'
+      ],
+      type: 'email',
+      required: true
+    },
+    phone: {
+      selectors: [
+        'input[type="tel"]',
+        'input[name*="phone"]',
+        'input[id*="phone"]'
+      ],
+      type: 'tel',
+      required: false
+    },
+    resume: {
+      selectors: [
+        'input[type="file"][name*="resume"]',
+        'input[type="file"][name*="cv"]',
+        'input[type="file"]'
+      ],
+      type: 'file',
+      required: true
+    }
+  }
+};
+
 class FormIntelligenceService {
   
   /**
@@ -35,17 +226,9 @@ class FormIntelligenceService {
   identifyPlatform(url) {
     const urlLower = url.toLowerCase();
     
-    if (urlLower.includes('greenhouse.io')) return 'greenhouse';
-    if (urlLower.includes('lever.co')) return 'lever';
-    if (urlLower.includes('myworkdayjobs.com') || urlLower.includes('workday.com')) return 'workday';
-    if (urlLower.includes('linkedin.com/jobs/apply')) return 'linkedin_easy';
-    if (urlLower.includes('indeed.com')) return 'indeed';
-    if (urlLower.includes('glassdoor.com')) return 'glassdoor';
-    if (urlLower.includes('smartrecruiters.com')) return 'smartrecruiters';
-    if (urlLower.includes('icims.com')) return 'icims';
-    if (urlLower.includes('bamboohr.com')) return 'bamboohr';
-    if (urlLower.includes('jobvite.com')) return 'jobvite';
-    if (urlLower.includes('taleo.net')) return 'taleo';
+    for (const [fragment, platform] of PLATFORM_HOSTS) {
+      if (urlLower.includes(fragment)) return platform;
+    }
     
     return 'custom';
   }
@@ -54,15 +237,7 @@ class FormIntelligenceService {
    * Get form type (easy, standard, complex)
    */
   getFormType(platform) {
-    const easyApply = ['linkedin_easy', 'indeed'];
-    const standard = ['greenhouse', 'lever', 'smartrecruiters', 'bamboohr'];
-    const complex = ['workday', 'taleo', 'icims', 'jobvite'];
-    
-    if (easyApply.includes(platform)) return 'easy';
-    if (standard.includes(platform)) return 'standard';
-    if (complex.includes(platform)) return 'complex';
-    
-    return 'custom';
+    return FORM_TYPE_BY_PLATFORM.get(platform) || 'custom';
   }
   
   /**
@@ -103,180 +278,20 @@ class FormIntelligenceService {
    * Get default field patterns for platform
    */
   getDefaultPatterns(platform) {
-    const patterns = {
-      greenhouse: {
-        firstName: {
-          selectors: ['#first_name', 'input[name="first_name"]', 'input[id*="first"]'],
-          type: 'text',
-          required: true
-        },
-        lastName: {
-          selectors: ['#last_name', 'input[name="last_name"]', 'input[id*="last"]'],
-          type: 'text',
-          required: true
-        },
-        email: {
-          selectors: ['#email', 'input[name="email"]', 'input[type="email"]'],
-          type: 'email',
-          required: true
-        },
-        phone: {
-          selectors: ['#phone', 'input[name="phone"]', 'input[type="tel"]'],
-          type: 'tel',
-          required: false
-        },
-        resume: {
-          selectors: ['#resume', 'input[name="resume"]', 'input[type="file"]'],
-          type: 'file',
-          required: true
-        },
-        coverLetter: {
-          selectors: ['#cover_letter', 'input[name="cover_letter"]'],
-          type: 'file',
-          required: false
-        },
-        linkedIn: {
-          selectors: ['input[name*="linkedin"]', 'input[placeholder*="LinkedIn"]'],
-          type: 'url',
-          required: false
-        }
-      },
-      
-      lever: {
-        name: {
-          selectors: ['input[name="name"]', '#name'],
-          type: 'text',
-          required: true
-        },
-        email: {
-          selectors: ['input[name="email"]', 'input[type="email"]'],
-          type: 'email',
-          required: true
-        },
-        phone: {
-          selectors: ['input[name="phone"]', 'input[type="tel"]'],
-          type: 'tel',
-          required: false
-        },
-        resume: {
-          selectors: ['input[name="resume"]', 'input[type="file"]'],
-          type: 'file',
-          required: true
-        }
-      },
-      
-      workday: {
-        firstName: {
-          selectors: ['input[data-automation-id*="firstName"]'],
-          type: 'text',
-          required: true
-        },
-        lastName: {
-          selectors: ['input[data-automation-id*="lastName"]'],
-          type: 'text',
-          required: true
-        },
-        email: {
-          selectors: ['input[data-automation-id*="email"]'],
-          type: 'email',
-          required: true
-        },
-        phone: {
-          selectors: ['input[data-automation-id*="phone"]'],
-          type: 'tel',
-          required: false
-        }
-      },
-      
-      linkedin_easy: {
-        phone: {
-          selectors: ['#single-line-text-form-component-phoneNumber'],
-          type: 'tel',
-          required: true
-        }
-      },
-      
-      indeed: {
-        name: {
-          selectors: ['#applicant.name', 'input[name="applicant.name"]'],
-          type: 'text',
-          required: true
-        },
-        phone: {
-          selectors: ['#applicant.phoneNumber', 'input[name="applicant.phoneNumber"]'],
-          type: 'tel',
-          required: true
-        },
-        email: {
-          selectors: ['#applicant.email', 'input[name="applicant.email"]'],
-          type: 'email',
-          required: true
-        }
-      },
-      
-      custom: {
-        // Generic patterns that work for most forms
-        firstName: {
-          selectors: [
-            'input[name*="first"]',
-            'input[id*="first"]',
-            'input[placeholder*="First"]'
-          ],
-          type: 'text',
-          required: true
-        },
-        lastName: {
-          selectors: [
-            'input[name*="last"]',
-            'input[id*="last"]',
-            'input[placeholder*="Last"]'
-          ],
-          type: 'text',
-          required: true
-        },
-        email: {
-          selectors: [
-            'input[type="email"]',
-            'input[name*="email"]',
-            'input[id*="email"]'
-          ],
-          type: 'email',
-          required: true
-        },
-        phone: {
-          selectors: [
-            'input[type="tel"]',
-            'input[name*="phone"]',
-            'input[id*="phone"]'
-          ],
-          type: 'tel',
-          required: false
-        },
-        resume: {
-          selectors: [
-            'input[type="file"][name*="resume"]',
-            'input[type="file"][name*="cv"]',
-            'input[type="file"]'
-          ],
-          type: 'file',
-          required: true
-        }
-      }
-    };
-    
-    return patterns[platform] || patterns.custom;
+    return DEFAULT_FIELD_PATTERNS[platform] || DEFAULT_FIELD_PATTERNS.custom;
   }
   
   /**
    * Map user data to form fields
    */
   mapUserDataToFields(patterns, userData) {
+    const values = this.resolveUserDataValues(userData);
     const mapping = {};
     
     for (const [fieldName, pattern] of Object.entries(patterns)) {
       mapping[fieldName] = {
         ...pattern,
-        value: this.getUserDataValue(fieldName, userData)
+        value: values[fieldName] || null
       };
     }
     
@@ -284,10 +299,10 @@ class FormIntelligenceService {
   }
   
   /**
-   * Get user data value for field
+   * Resolve every known field value from user data in one pass
    */
-  getUserDataValue(fieldName, userData) {
-    const mappings = {
+  resolveUserDataValues(userData) {
+    return {
       firstName: userData.personal?.firstName || userData.firstName,
       lastName: userData.personal?.lastName || userData.lastName,
       name: userData.personal?.fullName || userData.fullName,
@@ -311,8 +326,13 @@ class FormIntelligenceService {
       resume: userData.documents?.resumeBlob,
       coverLetter: userData.documents?.coverLetterBlob
     };
-    
-    return mappings[fieldName] || null;
+  }
+  
+  /**
+   * Get user data value for field
+   */
+  getUserDataValue(fieldName, userData) {
+    return this.resolveUserDataValues(userData)[fieldName] || null;
   }
   
   /**
@@ -334,11 +354,12 @@ class FormIntelligenceService {
    * Validate form data completeness
    */
   validateFormData(patterns, userData) {
+    const values = this.resolveUserDataValues(userData);
     const missing = [];
     const warnings = [];
     
     for (const [fieldName, pattern] of Object.entries(patterns)) {
-      const value = this.getUserDataValue(fieldName, userData);
+      const value = values[fieldName];
       
       if (pattern.required && !value) {
         missing.push(fieldName);
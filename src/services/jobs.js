@@ -5,11 +5,20 @@
  */
 
 const { query, transaction } = require('../db');
-const { calculateJobMatch } = require('./ai');
+const { calculateJobMatches, formatCandidateProfile } = require('./ai');
 const { sendJobAlertEmail } = require('./email');
 
 const ADZUNA_BASE_URL = 'https://api.adzuna.com/v1/api/jobs';
 
+// Case-insensitive match avoids lowercasing a full copy of every description
+const REMOTE_PATTERN = /remote/i;
+
+// Background alert scoring runs a few AI calls at a time, leaving the rest
+// of the shared Anthropic concurrency budget for interactive requests
+const MATCH_CONCURRENCY = 4;
+// Jobs scored per AI call
+const MATCH_BATCH_SIZE = 5;
+
 /**
  * Fetch jobs from Adzuna API
  */
@@ -27,53 +36,50 @@ async function fetchFromAdzuna(searchParams) {
     return [];
   }
 
-  const jobs = [];
-
-  for (const title of jobTitles) {
+  // Everything but the search term is the same for every title
+  const location = locations[0] ? encodeURIComponent(locations[0]) : '';
+  const baseUrl = `${ADZUNA_BASE_URL}/${country}/search/${page}?` +
+    `app_id=${process.env.ADZUNA_APP_ID}` +
+    `&app_key=${process.env.ADZUNA_APP_KEY}` +
+    `&results_per_page=${resultsPerPage}` +
+    (location ? `&where=${location}` : '') +
+    `&sort_by=date`;
+
+  // Each title is an independent search, so run them concurrently
+  const results = await Promise.all(jobTitles.map(async (title) => {
     try {
-      const searchQuery = encodeURIComponent(title);
-      const location = locations[0] ? encodeURIComponent(locations[0]) : '';
-      
-      const url = `${ADZUNA_BASE_URL}/${country}/search/${page}?` + 
-        `app_id=${process.env.ADZUNA_APP_ID}` +
-        `&app_key=${process.env.ADZUNA_APP_KEY}` +
-        `&results_per_page=${resultsPerPage}` +
-        `&what=${searchQuery}` +
-        (location ? `&where=${location}` : '') +
-        `&sort_by=date`;
+      const url = `${baseUrl}&what=${encodeURIComponent(title)}`;
 
       const response = await fetch(url);
       
       if (!response.ok) {
         console.error(`Adzuna API error: ${response.status}`);
-        continue;
+        return [];
       }
 
       const data = await response.json();
       
-      if (data.results) {
-        jobs.push(...data.results.map(job => ({
-          external_id: job.id,
-          source: 'adzuna',
-          title: job.title,
-          company: job.company?.display_name || 'Unknown',
-          location: job.location?.display_name || 'Unknown',
-          description: job.description,
-          salary_min: job.salary_min,
-          salary_max: job.salary_max,
-          job_type: job.contract_type || null,
-          is_remote: job.title?.toLowerCase().includes('remote') || 
-                     job.description?.toLowerCase().includes('remote'),
-          apply_url: job.redirect_url,
-          posted_at: job.created ? new Date(job.created) : new Date()
-        })));
-      }
+      return (data.results || []).map(job => ({
+        external_id: job.id,
+        source: 'adzuna',
+        title: job.title,
+        company: job.company?.display_name || 'Unknown',
+        location: job.location?.display_name || 'Unknown',
+        description: job.description,
+        salary_min: job.salary_min,
+        salary_max: job.salary_max,
+        job_type: job.contract_type || null,
+        is_remote: REMOTE_PATTERN.test(job.title || '') || REMOTE_PATTERN.test(job.description || ''),
+        apply_url: job.redirect_url,
+        posted_at: job.created ? new Date(job.created) : new Date()
+      }));
     } catch (error) {
       console.error(`Error fetching from Adzuna for "${title}":`, error);
+      return [];
     }
-  }
+  }));
 
-  return jobs;
+  return results.flat();
 }
 
 /**
@@ -142,37 +148,52 @@ async function matchJobsForUser(userId, jobs) {
   }
 
   const resumeData = resumeResult.rows[0];
-  const matches = [];
-
-  for (const job of jobs) {
-    try {
-      // Calculate match using AI
-      const matchResult = await calculateJobMatch(
-        {
-          title: job.title,
-          company: job.company,
-          required_skills: job.required_skills || []
-        },
-        {
-          skills: resumeData.extracted_skills,
-          target_job_titles: resumeData.extracted_job_titles,
-          years_of_experience: resumeData.years_of_experience
-        }
-      );
+  // Same candidate for every job - render their part of the prompt once
+  const candidateProfile = formatCandidateProfile({
+    skills: resumeData.extracted_skills,
+    target_job_titles: resumeData.extracted_job_titles,
+    years_of_experience: resumeData.years_of_experience
+  });
+  const scored = new Array(jobs.length);
+  let nextBatchStart = 0;
+
+  // Small worker pool: each worker scores the next batch of jobs until none remain
+  const scoreNext = async () => {
+    while (nextBatchStart < jobs.length) {
+      const start = nextBatchStart;
+      nextBatchStart += MATCH_BATCH_SIZE;
+      const batch = jobs.slice(start, start + MATCH_BATCH_SIZE);
+      try {
+        // Calculate matches using AI
+        const results = await calculateJobMatches(
+          batch.map(job => ({
+            title: job.title,
+            company: job.company,
+            required_skills: job.required_skills || []
+          })),
+          candidateProfile
+        );
 
-      if (matchResult.matchScore >= 50) { // Only save if decent match
-        matches.push({
-          job_id: job.id,
-          match_score: matchResult.matchScore,
-          matched_skills: matchResult.matchedSkills
+        results.forEach((matchResult, i) => {
+          if (matchResult?.matchScore >= 50) { // Only save if decent match
+            scored[start + i] = {
+              job_id: batch[i].id,
+              match_score: matchResult.matchScore,
+              matched_skills: matchResult.matchedSkills
+            };
+          }
         });
+      } catch (error) {
+        console.error('Match calculation error:', error);
       }
-    } catch (error) {
-      console.error('Match calculation error:', error);
     }
-  }
+  };
+
+  const batchCount = Math.ceil(jobs.length / MATCH_BATCH_SIZE);
+  await Promise.all(Array.from({ length: Math.min(MATCH_CONCURRENCY, batchCount) }, scoreNext));
 
-  return matches;
+  // Keep matches in the same order as the input jobs
+  return scored.filter(Boolean);
 }
 
 /**
@@ -251,15 +272,15 @@ async function processJobAlerts() {
           await saveUserMatches(alert.user_id, qualifiedMatches, alert.id);
 
           // Get full job details for email
-          const jobIds = qualifiedMatches.map(m => m.job_id);
+          const scoreByJobId = new Map(qualifiedMatches.map(m => [m.job_id, m.match_score]));
           const jobsResult = await query(
             `SELECT * FROM discovered_jobs WHERE id = ANY($1)`,
-            [jobIds]
+            [[...scoreByJobId.keys()]]
           );
 
           const jobsWithScores = jobsResult.rows.map(job => ({
             ...job,
-            match_score: qualifiedMatches.find(m => m.job_id === job.id)?.match_score || 0
+            match_score: scoreByJobId.get(job.id) || 0
           }));
 
           // Send email notification
@@ -0,0 +1,84 @@
+/**
+ * PDF Text Extraction Service
+ * Runs pdf-parse on a small worker-thread pool so large uploads don't block
+ * the event loop and concurrent uploads are spread across cores
+ */
+
+const os = require('os');
+const { Worker, isMainThread, parentPort } = require('worker_threads');
+const pdfParse = require('pdf-parse');
+
+const POOL_SIZE = Math.max(1, Math.min(os.availableParallelism() - 1, 4));
+
+// Worker side: parse each buffer it is sent and post back the text
+if (!isMainThread) {
+  parentPort.on('message', async ({ data, options }) => {
+    try {
+      const result = await pdfParse(Buffer.from(data.buffer, data.byteOffset, data.byteLength), options);
+      parentPort.postMessage({ text: result.text });
+    } catch (error) {
+      parentPort.postMessage({ error: error.message });
+    }
+  });
+}
+
+const queue = [];
+const idleWorkers = [];
+let workerCount = 0;
+
+function spawnWorker() {
+  const worker = new Worker(__filename);
+  workerCount++;
+
+  worker.on('message', ({ text, error }) => {
+    const task = worker.task;
+    worker.task = null;
+    if (error) task.reject(new Error(error));
+    else task.resolve(text);
+    runNext(worker);
+  });
+
+  worker.on('error', error => {
+    worker.task?.reject(error);
+    worker.task = null;
+  });
+
+  worker.on('exit', () => {
+    workerCount--;
+    const idleIndex = idleWorkers.indexOf(worker);
+    if (idleIndex !== -1) idleWorkers.splice(idleIndex, 1);
+    worker.task?.reject(new Error('PDF worker exited unexpectedly'));
+    if (queue.length > 0) runNext(spawnWorker());
+  });
+
+  return worker;
+}
+
+function runNext(worker) {
+  const task = queue.shift();
+  // Only busy workers keep the process alive, so idle ones never block shutdown
+  if (!task) {
+    worker.unref();
+    idleWorkers.push(worker);
+    return;
+  }
+  worker.ref();
+  worker.task = task;
+  worker.postMessage({ data: task.data, options: task.options });
+}
+
+/**
+ * Extract text from a PDF buffer off the main thread.
+ * Options are passed to pdf-parse and must be structured-cloneable.
+ */
+function extractPdfText(data, options = {}) {
+  return new Promise((resolve, reject) => {
+    queue.push({ data, options, resolve, reject });
+    const worker = idleWorkers.pop() || (workerCount < POOL_SIZE ? spawnWorker() : null);
+    if (worker) runNext(worker);
+  });
+}
+
+module.exports = {
+  extractPdfText
+};
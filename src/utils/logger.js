@@ -0,0 +1,18 @@
+/**
+ * Development Logging
+ */
+
+// Trace logging is development-only; in production it would write request
+// bodies, builder payloads and user emails to stdout on every call
+const LOG_DEBUG = process.env.NODE_ENV === 'development';
+
+/**
+ * console.log that only fires when NODE_ENV is development
+ */
+function debugLog(...args) {
+  if (LOG_DEBUG) console.log(...args);
+}
+
+module.exports = {
+  debugLog
+};
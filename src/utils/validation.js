@@ -0,0 +1,16 @@
+/**
+ * Request Validation Helpers
+ */
+
+/**
+ * Check that a request field is a non-empty string.
+ * Routes use this to reject non-string payloads up front so they 400
+ * instead of failing inside the AI service
+ */
+function isText(val) {
+  return typeof val === 'string' && val.trim().length > 0;
+}
+
+module.exports = {
+  isText
+};